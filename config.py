@@ -11,4 +11,63 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
 # 기타 설정
-MAX_VIDEO_DURATION = 1200  # 20분 (초 단위)
\ No newline at end of file
+MAX_VIDEO_DURATION = 1200  # 20분 (초 단위)
+
+# 인증 설정 (bcrypt 비용, 해시 작업 스레드 수, 세션 토큰 서명 키와 유효 기간)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "2"))
+SECRET_KEY = os.getenv("SECRET_KEY")  # 없으면 세션 토큰 비활성화 (새로고침 시 다시 로그인)
+SESSION_TOKEN_TTL_SECONDS = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", str(12 * 3600)))
+SESSION_COOKIE_NAME = "askontube_session"
+
+# 관리자 및 모니터링 설정
+ADMIN_USERNAMES = [name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip()]
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0이면 /metrics 엔드포인트 비활성화
+
+# API 호출 한도 ("공급자:모델" 별 분당 요청 수, 분당 토큰 수, 최대 동시 호출 수)
+API_RATE_LIMITS = {
+    "openai:whisper-1": {"rpm": 50, "tpm": None, "max_concurrency": 4},
+    "openai:text-embedding-ada-002": {"rpm": 3000, "tpm": 1000000, "max_concurrency": 16},
+    "gemini:models/gemini-1.5-pro-latest": {"rpm": 360, "tpm": 4000000, "max_concurrency": 8},
+    "openai:gpt-4o-mini": {"rpm": 500, "tpm": 2000000, "max_concurrency": 8},
+}
+DEFAULT_RATE_LIMIT = {"rpm": 60, "tpm": None, "max_concurrency": 4}
+RATE_LIMIT_MAX_RETRIES = 5
+
+# 답변 생성 모델 설정 (주 모델이 늦으면 보조 모델로 헤지, 오류 시 페일오버)
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-1.5-pro-latest")
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+GENERATION_PROVIDERS = [name.strip() for name in os.getenv("GENERATION_PROVIDERS", "gemini,openai").split(",") if name.strip()]
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", "15"))  # 음수이면 헤지하지 않고 오류 시에만 페일오버
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "16"))  # 주 모델 요청 스레드 수
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "8"))  # 헤지/페일오버 요청 전용 스레드 수 (주 요청이 밀려도 보조 요청은 바로 실행)
+
+# 영상 채팅 설정
+CHAT_HISTORY_TURNS = 10  # 모델에 유지할 최근 대화 턴 수
+
+# 임베딩 배치 설정 (짧은 시간 안에 들어온 요청을 한 번의 API 호출로 묶음)
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_BATCH_WINDOW_SECONDS = 0.02
+EMBEDDING_MAX_BATCH_SIZE = 256
+EMBEDDING_MAX_BATCH_TOKENS = 250000
+
+# 유사 중복 영상 판정 기준 (자막 내용 유사도/포함도, 자막이 없을 때 제목·길이 유사도)
+NEAR_DUPLICATE_THRESHOLD = 0.7
+NEAR_DUPLICATE_TITLE_THRESHOLD = 0.8
+
+# YouTube 메타데이터/자막 트랙 캐시 설정
+VIDEO_METADATA_CACHE_SIZE = 4096
+VIDEO_METADATA_CACHE_TTL_SECONDS = 3600
+
+# URL 입력 즉시 메타데이터/자막을 미리 가져오는 설정
+PREFETCH_WORKERS = 4
+PREFETCH_TTL_SECONDS = 600
+PREFETCH_WAIT_SECONDS = 30  # 버튼을 눌렀을 때 진행 중인 미리 가져오기를 기다리는 최대 시간
+
+# 명령줄 일괄 처리(ingest_cli.py) 기본 동시 작업 수
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+
+# 다수 영상 질문(map-reduce) 설정
+MAP_REDUCE_TOP_VIDEOS = 8  # 요약으로 골라낼 영상 수
+MAP_REDUCE_TOP_PASSAGES = 40  # 골라낸 영상에서 메모리에 유지할 최대 문단 수
+MAP_REDUCE_TOKEN_BUDGET = 12000  # 프롬프트에 넣을 요약+문단의 최대 토큰 수 (추정치)
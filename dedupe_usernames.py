@@ -0,0 +1,13 @@
+"""중복 사용자명을 하나의 계정으로 합치는 일회성 마이그레이션
+
+users.username unique 인덱스를 만들기 전에 실행합니다. 실행 후 앱을 재시작하면 인덱스가 생성됩니다.
+
+사용법: python dedupe_usernames.py
+"""
+from modules.database import dedupe_usernames, ensure_indexes
+
+
+if __name__ == "__main__":
+    merged_users = dedupe_usernames()
+    ensure_indexes()
+    print(f"중복 계정 {merged_users}개를 합쳤습니다.")
@@ -0,0 +1,199 @@
+"""브라우저 없이 여러 영상을 한꺼번에 처리하는 명령줄 도구
+
+파일의 각 줄에 YouTube URL 또는 비디오 ID를 하나씩 적습니다. (빈 줄과 #으로 시작하는 줄은 무시)
+진행 상황은 체크포인트 파일(JSONL)에 기록되므로, 중단된 뒤 같은 명령을 다시 실행하면 끝난 영상은 건너뜁니다.
+
+사용법: python ingest_cli.py videos.txt --username 사용자명 [--workers 4] [--checkpoint videos.txt.progress.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from config import INGEST_WORKERS, MAX_VIDEO_DURATION
+from modules import database, video_processing
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 다시 실행할 때 건너뛰는 상태 (failed와 needs_review는 다시 시도)
+FINISHED_STATUSES = {"done", "linked", "skipped"}
+
+
+def read_video_ids(path):
+    """입력 파일의 URL/ID를 비디오 ID로 바꿉니다. 중복은 처음 나온 것만 남깁니다."""
+    video_ids = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            entry = line.strip()
+            if not entry or entry.startswith("#"):
+                continue
+            try:
+                if 'youtube.com' in entry or 'youtu.be' in entry:
+                    _, video_id = video_processing.extract_video_id_and_process(entry)
+                else:
+                    video_id = entry
+            except ValueError as e:
+                logger.warning(f"{line_number}번째 줄을 건너뜁니다: {str(e)}")
+                continue
+            video_ids.append(video_id)
+    return list(dict.fromkeys(video_ids))
+
+
+class Checkpoint:
+    """영상별 처리 결과를 한 줄씩 추가 기록하는 JSONL 파일. 같은 영상은 마지막 기록이 유효합니다."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.statuses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 기록 도중 중단된 마지막 줄
+                    self.statuses[record["video_id"]] = record["status"]
+
+    def is_finished(self, video_id):
+        return self.statuses.get(video_id) in FINISHED_STATUSES
+
+    def record(self, video_id, status, **details):
+        line = json.dumps({"video_id": video_id, "status": status, "at": time.time(), **details}, ensure_ascii=False)
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.statuses[video_id] = status
+
+
+def filter_by_metadata(video_ids, checkpoint):
+    """
+    메타데이터를 50개씩 묶어 한 번에 가져와 캐시를 채우고, 없는 영상과 너무 긴 영상은 처리 전에 건너뜁니다.
+    남은 영상과 그 길이(초), 건너뛴 영상 수를 반환합니다.
+    """
+    try:
+        info = video_processing.get_videos_info_bulk(video_ids)
+    except Exception as e:
+        # 일괄 조회가 실패하면 각 영상 처리 과정에서 개별로 조회
+        logger.warning(f"메타데이터 일괄 조회 실패, 영상별로 조회합니다: {str(e)}")
+        return {video_id: 0 for video_id in video_ids}, 0
+
+    durations = {}
+    for video_id in video_ids:
+        if video_id not in info:
+            checkpoint.record(video_id, "skipped", reason="영상을 찾을 수 없습니다.")
+        elif info[video_id][2] > MAX_VIDEO_DURATION:
+            checkpoint.record(video_id, "skipped", reason=f"비디오 길이가 {MAX_VIDEO_DURATION // 60}분을 초과합니다.")
+        else:
+            durations[video_id] = info[video_id][2]
+    return durations, len(video_ids) - len(durations)
+
+
+def ingest_one(video_id, user_id, link_near_duplicates):
+    """
+    영상 하나를 처리하고 (상태, 상세 정보)를 반환합니다.
+    자막 내용이 같은 영상에만 자동으로 연결하고, 제목과 길이만 비슷한 영상(시리즈의 다른 회차일 수 있음)은
+    needs_review로 남겨 사람이 확인하도록 합니다.
+    """
+    try:
+        video_processing.process_video(video_id, user_id, check_near_duplicates=link_near_duplicates)
+        return "done", {}
+    except video_processing.NearDuplicateFound as e:
+        content_matches = [candidate for candidate in e.candidates if candidate["match"] == "content"]
+        if not content_matches:
+            best = e.candidates[0]
+            return "needs_review", {"candidate_video_id": best["video_id"], "similarity": best["similarity"]}
+        best = content_matches[0]
+        video_processing.link_to_existing_video(video_id, best["video_id"], user_id)
+        return "linked", {"existing_video_id": best["video_id"], "similarity": best["similarity"]}
+
+
+def run(video_ids, user_id, checkpoint, workers, link_near_duplicates):
+    """작업 스레드로 영상을 처리하고 상태별 개수, 영상별 소요 시간, 처리한 영상 길이 합계를 반환합니다."""
+    elapsed = []
+    durations, skipped = filter_by_metadata(video_ids, checkpoint)
+    counts = {"skipped": skipped} if skipped else {}
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+
+    def task(video_id):
+        start = time.perf_counter()
+        try:
+            status, details = ingest_one(video_id, user_id, link_near_duplicates)
+        except Exception as e:
+            status, details = "failed", {"error": str(e)}
+        seconds = time.perf_counter() - start
+        checkpoint.record(video_id, status, seconds=round(seconds, 2), **details)
+        return video_id, status, seconds
+
+    try:
+        futures = [executor.submit(task, video_id) for video_id in durations]
+        for completed, future in enumerate(as_completed(futures), 1):
+            video_id, status, seconds = future.result()
+            counts[status] = counts.get(status, 0) + 1
+            if status == "done":
+                elapsed.append(seconds)
+            logger.info(f"[{completed}/{len(futures)}] {video_id}: {status} ({seconds:.1f}초)")
+    except KeyboardInterrupt:
+        logger.warning("중단 요청을 받았습니다. 진행 중인 영상이 끝나면 종료합니다. 다시 실행하면 이어서 처리합니다.")
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+
+    processed_media = sum(durations[video_id] for video_id, status in checkpoint.statuses.items()
+                          if video_id in durations and status == "done")
+    return counts, elapsed, processed_media
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YouTube 영상 일괄 처리")
+    parser.add_argument("input", help="URL 또는 비디오 ID 목록 파일 (한 줄에 하나)")
+    parser.add_argument("--username", required=True, help="처리한 영상을 추가할 사용자명")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="동시에 처리할 영상 수")
+    parser.add_argument("--checkpoint", help="진행 상황 파일 (기본값: 입력 파일명.progress.jsonl)")
+    parser.add_argument("--process-near-duplicates", action="store_true",
+                        help="유사한 기존 영상이 있어도 새로 처리 (기본값은 자막 내용이 같으면 기존 영상에 연결)")
+    args = parser.parse_args()
+
+    database.ensure_indexes()
+    user = database.get_user_by_username(args.username)
+    if not user:
+        sys.exit(f"사용자 '{args.username}'을(를) 찾을 수 없습니다.")
+
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.progress.jsonl")
+    video_ids = read_video_ids(args.input)
+    pending = [video_id for video_id in video_ids if not checkpoint.is_finished(video_id)]
+    print(f"전체 {len(video_ids)}개 중 {len(video_ids) - len(pending)}개는 이미 끝났습니다. "
+          f"{len(pending)}개를 {args.workers}개 작업으로 처리합니다.")
+
+    start = time.perf_counter()
+    counts, elapsed, processed_media = run(pending, user['_id'], checkpoint, args.workers,
+                                           link_near_duplicates=not args.process_near_duplicates)
+    wall = time.perf_counter() - start
+
+    print()
+    print(f"소요 시간: {video_processing.format_time(wall)}")
+    print("결과: " + ", ".join(f"{status} {count}개" for status, count in sorted(counts.items())))
+    if wall > 0:
+        finished = counts.get("done", 0) + counts.get("linked", 0)
+        print(f"처리량: 시간당 {finished / wall * 3600:.1f}개 영상, "
+              f"실제 시간 1초당 영상 {processed_media / wall:.1f}초 분량")
+    if elapsed:
+        elapsed.sort()
+        print(f"영상당 처리 시간: 평균 {sum(elapsed) / len(elapsed):.1f}초, "
+              f"p95 {elapsed[min(len(elapsed) - 1, int(0.95 * len(elapsed)))]:.1f}초")
+    if counts.get("failed"):
+        print(f"실패한 영상은 {checkpoint.path}에 기록되었습니다. 같은 명령을 다시 실행하면 재시도합니다.")
+    if counts.get("needs_review"):
+        print(f"제목과 길이만 비슷한 기존 영상이 있어 처리하지 않은 영상은 {checkpoint.path}에 needs_review로 기록되었습니다. "
+              f"확인 후 --process-near-duplicates로 다시 실행하면 새로 처리합니다.")
+
+
+if __name__ == "__main__":
+    main()
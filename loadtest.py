@@ -0,0 +1,479 @@
+"""
+동시 세션 부하 테스트 도구.
+
+Streamlit AppTest로 main.py를 여러 세션에서 동시에 실행하며 로그인, 영상 처리, 목록/태그, 질문, 채팅
+흐름을 재현합니다. MongoDB와 외부 API는 메모리 내 가짜 백엔드로 대체하고 응답 지연만 흉내 내므로,
+측정값은 UI 렌더링(rerun)과 세션 상태 비용에 해당합니다.
+
+사용 예:
+    python loadtest.py --sessions 50 --concurrency 10 --llm-latency 0.5
+    python loadtest.py --sessions 20 --memory   # 시간 측정 후 별도 실행으로 세션당 메모리 측정
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+# 실제 클라이언트 생성 시 API 키 검사를 통과하도록 임의 값 설정 (네트워크 호출은 모두 가짜 백엔드로 대체됨)
+for _key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "YOUTUBE_API_KEY"):
+    os.environ.setdefault(_key, "loadtest")
+
+from unittest.mock import MagicMock
+from streamlit import config as streamlit_config
+from streamlit import logger as streamlit_logger
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+from bson import ObjectId
+import bcrypt
+from modules import auth, database, video_processing, nlp, chat
+from modules.database import MAX_TAGS_PER_VIDEO
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+PASSWORD = "loadtest-password"
+
+
+class FakeBackend:
+    """UI가 호출하는 database/auth/video_processing/nlp/chat 함수를 메모리에서 흉내 냅니다."""
+
+    def __init__(self, llm_latency, processing_latency):
+        self.llm_latency = llm_latency
+        self.processing_latency = processing_latency
+        self.lock = threading.Lock()
+        self.users = {}  # username -> user
+        self.videos = {}  # video_id -> video
+        self.memberships = {}  # (user_id, video_id) -> membership
+        self.feedback = []
+
+    # 인증 (해시는 실제 bcrypt와 제한된 작업 스레드를 사용해 로그인 폭주 비용을 반영)
+    def register_user(self, username, password):
+        hashed_password = auth.hash_password(password)
+        with self.lock:
+            if username in self.users:
+                return False
+            self.users[username] = {"_id": ObjectId(), "username": username, "password": hashed_password}
+        return True
+
+    def authenticate_user(self, username, password):
+        user = self.users.get(username)
+        if user and auth._run_hash(bcrypt.checkpw, password.encode('utf-8'), user['password']):
+            return user
+        return None
+
+    def get_user_by_id(self, user_id):
+        return next((user for user in self.users.values() if user['_id'] == user_id), None)
+
+    # 영상 처리
+    def get_video_info(self, url):
+        _, video_id = video_processing.extract_video_id_and_process(url)
+        return f"Load test video {video_id}", "Load test channel", 600
+
+    def get_existing_video(self, video_id):
+        return self.videos.get(video_id)
+
+    def process_video(self, video_url, user_id, progress_bar=None, check_near_duplicates=True):
+        _, video_id = video_processing.extract_video_id_and_process(video_url)
+        time.sleep(self.processing_latency)
+        segments = [{"start": i * 10.0, "end": (i + 1) * 10.0, "text": f"구간 {i}의 내용입니다. " * 5}
+                    for i in range(120)]
+        transcript = " ".join(segment["text"] for segment in segments)
+        with self.lock:
+            self.videos[video_id] = {
+                "_id": ObjectId(), "video_id": video_id, "title": f"Load test video {video_id}",
+                "channel": "Load test channel", "duration": 600, "processed_at": datetime.now(),
+                "transcript": transcript, "transcript_length": len(transcript),
+                "segments": segments, "segment_count": len(segments),
+                "summary": "요약", "key_points": ["핵심"],
+            }
+        if progress_bar:
+            progress_bar.progress(100, text="처리 완료!")
+        self.add_video_for_user(user_id, video_id)
+        return self.videos[video_id]["_id"]
+
+    def add_video_for_user(self, user_id, video_id):
+        with self.lock:
+            self.memberships.setdefault((user_id, video_id), {"added_at": datetime.now(), "tags": []})
+
+    def link_to_existing_video(self, video_id, existing_video_id, user_id):
+        self.add_video_for_user(user_id, existing_video_id)
+
+    # 목록/태그
+    def _user_memberships(self, user_id):
+        with self.lock:
+            return [(video_id, membership) for (owner, video_id), membership in self.memberships.items()
+                    if owner == user_id]
+
+    def get_user_videos(self, user_id, selected_tags=None, start_date=None, end_date=None, show_no_tags=False):
+        videos = []
+        for video_id, membership in self._user_memberships(user_id):
+            if selected_tags and not set(selected_tags) & set(membership["tags"]):
+                continue
+            if show_no_tags and membership["tags"]:
+                continue
+            if start_date and end_date and not start_date <= membership["added_at"] <= end_date:
+                continue
+            video = {key: value for key, value in self.videos[video_id].items()
+                     if key in database.VIDEO_LISTING_FIELDS or key == "_id"}
+            videos.append({**video, "tags": list(membership["tags"]), "added_at": membership["added_at"]})
+        return sorted(videos, key=lambda video: video["added_at"], reverse=True)
+
+    def get_tag_counts(self, user_id):
+        counts = defaultdict(int)
+        for _, membership in self._user_memberships(user_id):
+            for tag in membership["tags"]:
+                counts[tag] += 1
+        return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+    def get_all_tags(self, user_id):
+        return sorted(self.get_tag_counts(user_id))
+
+    def add_tag_to_video(self, user_id, video_id, tag):
+        with self.lock:
+            membership = self.memberships.get((user_id, video_id))
+            if not membership or tag in membership["tags"] or len(membership["tags"]) >= MAX_TAGS_PER_VIDEO:
+                return False
+            membership["tags"].append(tag)
+            return True
+
+    def remove_tag_from_video(self, user_id, video_id, tag):
+        with self.lock:
+            membership = self.memberships.get((user_id, video_id))
+            if not membership or tag not in membership["tags"]:
+                return False
+            membership["tags"].remove(tag)
+            return True
+
+    def bulk_update_tags(self, user_id, video_ids, add_tags=(), remove_tags=()):
+        changed = 0
+        for video_id in video_ids:
+            changed += sum(self.add_tag_to_video(user_id, video_id, tag) for tag in add_tags)
+            changed += sum(self.remove_tag_from_video(user_id, video_id, tag) for tag in remove_tags)
+        return changed
+
+    def get_user_video_ids_by_tags(self, user_id, tags):
+        return [video["video_id"] for video in self.get_user_videos(user_id, selected_tags=tags)]
+
+    def get_videos_by_ids(self, video_ids):
+        return [self.videos[video_id] for video_id in video_ids]
+
+    def iter_video_digests(self, video_ids):
+        for video in self.get_videos_by_ids(video_ids):
+            yield {**video, "summary": "요약", "key_points": ["핵심"]}
+
+    def iter_video_transcripts(self, video_ids):
+        for video_id in video_ids:
+            yield self.videos[video_id]
+
+    def get_video_info_from_db(self, video_ids):
+        return [self.videos[video_id] for video_id in video_ids if video_id in self.videos]
+
+    def get_video_segments(self, video_id, skip=0, limit=50):
+        video = self.videos.get(video_id)
+        if not video:
+            return None
+        return {**video, "segments": video["segments"][skip:skip + limit]}
+
+    def save_feedback(self, user_id, feedback):
+        with self.lock:
+            self.feedback.append((user_id, feedback))
+
+    # 답변 생성 (지연만 흉내 냄)
+    def generate_response(self, query, transcripts, top_k=5):
+        time.sleep(self.llm_latency)
+        return f"'{query}'에 대한 답변입니다."
+
+    def generate_map_reduce_response(self, query, videos_iter, load_videos, token_budget=None):
+        videos = list(videos_iter)
+        list(load_videos([video["video_id"] for video in videos]))
+        time.sleep(self.llm_latency)
+        return f"'{query}'에 대한 {len(videos)}개 영상 기반 답변입니다."
+
+    def chat_session_class(self):
+        backend = self
+
+        class FakeChatSession:
+            def __init__(self, video):
+                self.video_id = video['video_id']
+                self.title = video.get('title', 'Unknown')
+                self.history = []
+
+            def ask(self, question):
+                answer = backend.generate_response(question, [])
+                self.history.append({"role": "user", "content": question})
+                self.history.append({"role": "assistant", "content": answer})
+                return answer
+
+            def reset(self):
+                self.history = []
+
+        return FakeChatSession
+
+    def install(self):
+        """앱 모듈의 외부 의존 함수를 가짜 구현으로 바꿉니다. (AppTest는 같은 프로세스의 모듈을 공유함)"""
+        patches = {
+            auth: {"register_user": self.register_user, "authenticate_user": self.authenticate_user},
+            database: {
+                "ensure_indexes": lambda: None,
+                "get_user_by_id": self.get_user_by_id,
+                "get_user_videos": self.get_user_videos,
+                "get_tag_counts": self.get_tag_counts,
+                "get_all_tags": self.get_all_tags,
+                "add_tag_to_video": self.add_tag_to_video,
+                "remove_tag_from_video": self.remove_tag_from_video,
+                "bulk_update_tags": self.bulk_update_tags,
+                "get_user_video_ids_by_tags": self.get_user_video_ids_by_tags,
+                "get_videos_by_ids": self.get_videos_by_ids,
+                "iter_video_digests": self.iter_video_digests,
+                "iter_video_transcripts": self.iter_video_transcripts,
+                "get_video_info_from_db": self.get_video_info_from_db,
+                "get_video_segments": self.get_video_segments,
+                "save_feedback": self.save_feedback,
+            },
+            video_processing: {
+                "prefetch_video": lambda url: None,
+                "wait_for_prefetch": lambda video_id, timeout=None: None,
+                "get_video_info": self.get_video_info,
+                "get_existing_video": self.get_existing_video,
+                "process_video": self.process_video,
+                "update_user_for_video": lambda video_id, user_id: self.add_video_for_user(user_id, video_id),
+                "link_to_existing_video": self.link_to_existing_video,
+            },
+            nlp: {
+                "generate_response": self.generate_response,
+                "generate_map_reduce_response": self.generate_map_reduce_response,
+            },
+            chat: {"ChatSession": self.chat_session_class()},
+        }
+        for module, functions in patches.items():
+            for name, fn in functions.items():
+                setattr(module, name, fn)
+
+
+def share_app_test_runtime():
+    """
+    AppTest는 rerun마다 전역 Runtime 인스턴스를 만들고 끝나면 지우므로, 여러 세션을 스레드에서 동시에
+    실행하면 서로의 런타임을 지웁니다. 하나의 서버 프로세스처럼 모든 세션이 공유하는 런타임을 기본값으로 둡니다.
+    """
+    shared_runtime = MagicMock(spec=Runtime)
+    shared_runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared_runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared_runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    # rerun마다 설정을 바꿨다가 되돌리므로, 겹치는 rerun이 다른 값으로 되돌리지 않도록 미리 켜 둠
+    streamlit_config.set_option("global.appTest", True)
+
+
+class SimulatedSession:
+    """한 사용자의 브라우저 세션. 각 동작(rerun)의 소요 시간을 화면별로 기록합니다."""
+
+    def __init__(self, index, videos_per_session, timeout):
+        self.username = f"loadtest-{index}-{ObjectId()}"
+        self.video_ids = [f"lt{index:05d}{n:04d}" for n in range(videos_per_session)]
+        self.app = AppTest.from_file(APP_SCRIPT, default_timeout=timeout)
+        self.timings = []  # (page, seconds)
+
+    def _step(self, page, action):
+        start = time.perf_counter()
+        action()
+        self.timings.append((page, time.perf_counter() - start))
+        if self.app.exception:
+            raise RuntimeError(f"{page}: {self.app.exception[0].value}")
+
+    def _widget(self, widgets, label=None, key=None):
+        for widget in widgets:
+            if (label is None or widget.label == label) and (key is None or widget.key == key):
+                return widget
+        raise LookupError(f"위젯을 찾을 수 없습니다: label={label}, key={key}")
+
+    def _sidebar(self, label):
+        return lambda: self._widget(self.app.sidebar.button, label=label).click().run()
+
+    def run(self):
+        app = self.app
+        self._step("login", app.run)
+
+        def register():
+            self._widget(app.text_input, label="새 사용자명").input(self.username)
+            self._widget(app.text_input, label="새 비밀번호").input(PASSWORD)
+            self._widget(app.button, label="회원가입").click().run()
+        self._step("register", register)
+
+        def login():
+            self._widget(app.text_input, label="사용자명").input(self.username)
+            self._widget(app.text_input, label="비밀번호").input(PASSWORD)
+            self._widget(app.button, label="로그인").click().run()
+        self._step("login_submit", login)
+
+        for video_id in self.video_ids:
+            self._step("process_video", self._sidebar("새 영상 처리"))
+
+            def process():
+                self._widget(app.text_input, key="video_url_input").input(
+                    f"https://www.youtube.com/watch?v={video_id}").run()
+                self._widget(app.button, key="process_video_button").click().run()
+            self._step("process_video_submit", process)
+
+        self._step("view_videos", self._sidebar("처리된 영상 목록보기"))
+        video_id = self.video_ids[0]
+
+        def add_tag():
+            self._widget([w for w in app.text_input if w.key.startswith(f"new_tag_{video_id}_")]).input("부하테스트")
+            self._widget(app.button, key=f"add_tag_{video_id}").click().run()
+        self._step("add_tag", add_tag)
+
+        self._step("ask_question", self._sidebar("질문하기"))
+
+        def ask():
+            self._widget(app.text_input, label="질문을 입력하세요").input("이 영상의 핵심은 무엇인가요?")
+            self._widget(app.button, label="답변 받기").click().run()
+        self._step("ask_question_submit", ask)
+
+        def ask_by_tag():
+            self._widget(app.radio, label="질문 모드 선택").set_value("태그에 포함된 다수 영상 기반 질문").run()
+            self._widget(app.multiselect, key="tag_selector").select("부하테스트").run()
+            self._widget(app.text_input, label="질문을 입력하세요").input("공통 주제는 무엇인가요?")
+            self._widget(app.button, label="답변 받기").click().run()
+        self._step("ask_by_tag_submit", ask_by_tag)
+
+        self._step("view_videos", self._sidebar("처리된 영상 목록보기"))
+        self._step("chat", lambda: self._widget(app.button, key=f"chat_{video_id}").click().run())
+        self._step("chat_submit", lambda: app.chat_input[0].set_value("더 자세히 설명해주세요.").run())
+        self._step("view_videos", lambda: self._widget(app.button, label="영상 목록으로 돌아가기").click().run())
+        self._step("full_transcript", lambda: self._widget(app.button, key=f"full_{video_id}").click().run())
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_sessions(simulated, concurrency):
+    """세션들을 동시에 실행하고 실패한 세션 목록을 반환합니다."""
+    failures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(session.run): session for session in simulated}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failures.append(f"{futures[future].username}: {str(e)}")
+    return failures
+
+
+def measure_memory(sessions, concurrency, videos_per_session, timeout):
+    """
+    시간을 재지 않는 별도 실행에서 세션당 메모리와 최대 메모리를 측정합니다.
+    tracemalloc은 모든 할당을 추적해 rerun을 크게 느리게 하므로 지연 시간 측정과 함께 켜지 않습니다.
+    """
+    tracemalloc.start()
+    try:
+        simulated = [SimulatedSession(sessions + index, videos_per_session, timeout) for index in range(sessions)]
+        run_sessions(simulated, concurrency)
+        # 세션(AppTest와 세션 상태)을 유지한 상태에서 측정
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "memory_per_session_kb": round(current / sessions / 1024, 1) if sessions else 0.0,
+        "peak_memory_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+def run_load_test(sessions, concurrency, videos_per_session, llm_latency, processing_latency, timeout,
+                  memory=False):
+    """
+    세션들을 동시에 실행하고 화면별 지연 시간과 처리량을 집계합니다.
+    memory=True이면 시간 측정이 끝난 뒤 별도 실행으로 세션당 메모리를 측정합니다.
+    """
+    FakeBackend(llm_latency, processing_latency).install()
+    share_app_test_runtime()
+
+    simulated = [SimulatedSession(index, videos_per_session, timeout) for index in range(sessions)]
+    start = time.perf_counter()
+    failures = run_sessions(simulated, concurrency)
+    elapsed = time.perf_counter() - start
+
+    timings = defaultdict(list)
+    for session in simulated:
+        for page, seconds in session.timings:
+            timings[page].append(seconds)
+    steps = sum(len(values) for values in timings.values())
+
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "failed_sessions": len(failures),
+        "failures": failures[:10],
+        "elapsed_seconds": round(elapsed, 2),
+        "reruns_per_second": round(steps / elapsed, 2) if elapsed else 0.0,
+        "sessions_per_minute": round((sessions - len(failures)) / elapsed * 60, 2) if elapsed else 0.0,
+        "memory": measure_memory(sessions, concurrency, videos_per_session, timeout) if memory else None,
+        "pages": {
+            page: {
+                "count": len(values),
+                "mean": round(statistics.mean(values), 3),
+                "p50": round(percentile(values, 0.5), 3),
+                "p95": round(percentile(values, 0.95), 3),
+                "max": round(max(values), 3),
+            }
+            for page, values in timings.items()
+        },
+    }
+
+
+def print_report(report):
+    print(f"세션 {report['sessions']}개 (동시 {report['concurrency']}개), 실패 {report['failed_sessions']}개, "
+          f"{report['elapsed_seconds']}초 소요")
+    print(f"처리량: {report['reruns_per_second']} rerun/초, {report['sessions_per_minute']} 세션/분")
+    if report["memory"]:
+        memory = report["memory"]
+        print(f"메모리 (별도 실행): 세션당 약 {memory['memory_per_session_kb']} KB, 최대 {memory['peak_memory_mb']} MB")
+    print()
+    print(f"{'화면':<22}{'횟수':>6}{'평균':>9}{'p50':>9}{'p95':>9}{'최대':>9}")
+    for page, stats in report["pages"].items():
+        print(f"{page:<22}{stats['count']:>6}{stats['mean']:>9.3f}{stats['p50']:>9.3f}"
+              f"{stats['p95']:>9.3f}{stats['max']:>9.3f}")
+    for failure in report["failures"]:
+        print(f"실패: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AskOnTube 동시 세션 부하 테스트")
+    parser.add_argument("--sessions", type=int, default=20, help="시뮬레이션할 전체 세션 수")
+    parser.add_argument("--concurrency", type=int, default=10, help="동시에 실행할 세션 수")
+    parser.add_argument("--videos-per-session", type=int, default=2, help="세션마다 처리할 영상 수")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="가짜 답변 생성 지연 (초)")
+    parser.add_argument("--processing-latency", type=float, default=0.5, help="가짜 영상 처리 지연 (초)")
+    parser.add_argument("--timeout", type=float, default=60, help="rerun 하나의 최대 대기 시간 (초)")
+    parser.add_argument("--memory", action="store_true",
+                        help="시간 측정 후 tracemalloc을 켠 별도 실행으로 세션당 메모리 측정")
+    parser.add_argument("--json", help="결과를 JSON으로 저장할 경로")
+    args = parser.parse_args()
+
+    # 앱 로그와 Streamlit의 bare mode 경고가 결과 출력을 가리지 않도록 함
+    logging.getLogger().setLevel(logging.WARNING)
+    streamlit_logger.set_log_level("ERROR")
+
+    report = run_load_test(args.sessions, args.concurrency, args.videos_per_session,
+                           args.llm_latency, args.processing_latency, args.timeout, memory=args.memory)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import streamlit as st
-from modules import auth, video_processing, database, ui, nlp
+from modules import auth, video_processing, database, ui, nlp, metrics
+from config import METRICS_PORT, SESSION_COOKIE_NAME
 
 def initialize_session_state():
     if 'processed_videos' not in st.session_state:
@@ -7,7 +8,10 @@ def initialize_session_state():
     if 'page' not in st.session_state:
         st.session_state.page = 'login'
     if 'user' not in st.session_state:
-        st.session_state.user = None
+        # 새로고침/재연결 시 쿠키의 서명된 세션 토큰으로 로그인 상태 복원
+        st.session_state.user = auth.restore_session(st.context.cookies.get(SESSION_COOKIE_NAME))
+        if st.session_state.user and st.session_state.page == 'login':
+            st.session_state.page = 'process_video'
     if 'selected_video_id' not in st.session_state:
         st.session_state.selected_video_id = None
 
@@ -15,11 +19,15 @@ def main():
     st.set_page_config(page_title="AskOnTube", page_icon="🎥", layout="wide")
     ui.show_header()
 
+    database.ensure_indexes()
     initialize_session_state()
+    metrics.start_metrics_server(METRICS_PORT)
 
     if st.session_state.user:
         ui.show_sidebar()
 
+    ui.sync_session_cookie()
+
     if st.session_state.page == 'login':
         ui.show_login_form()
     elif st.session_state.page == 'process_video':
@@ -34,6 +42,8 @@ def main():
         ui.show_chat_page()
     elif st.session_state.page == 'feedback':
         ui.show_feedback_form()
+    elif st.session_state.page == 'metrics':
+        ui.show_metrics_page()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,10 @@
+"""저장된 비디오의 유사 중복 탐지 지문(MinHash)을 현재 방식으로 다시 계산하는 일회성 마이그레이션
+
+사용법: python migrate_fingerprints.py
+"""
+from modules.video_processing import recompute_fingerprints
+
+
+if __name__ == "__main__":
+    updated = recompute_fingerprints()
+    print(f"비디오 {updated}개의 지문을 다시 계산했습니다.")
@@ -0,0 +1,10 @@
+"""videos.user_ids 배열을 video_memberships 컬렉션으로 옮기는 일회성 마이그레이션
+
+사용법: python migrate_memberships.py
+"""
+from modules.database import migrate_user_ids_to_memberships
+
+
+if __name__ == "__main__":
+    migrated_videos, upserted = migrate_user_ids_to_memberships()
+    print(f"비디오 {migrated_videos}개를 처리했고, 사용자-비디오 소속 정보 {upserted}개를 새로 만들었습니다.")
@@ -1,18 +1,96 @@
+import hashlib
+import hmac
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
 import bcrypt
-from modules.database import users_collection
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from config import BCRYPT_ROUNDS, AUTH_WORKERS, SECRET_KEY, SESSION_TOKEN_TTL_SECONDS
+from modules.database import users_collection, get_user_by_id
+from modules import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# bcrypt는 CPU를 많이 쓰므로 동시에 실행되는 해시 작업 수를 제한함 (로그인이 몰려도 다른 세션이 멈추지 않도록)
+_hash_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+
+
+def _run_hash(fn, *args):
+    """해시 작업을 작업 스레드에서 실행하고 결과를 기다립니다."""
+    with metrics.span("password_hash"):
+        return _hash_executor.submit(fn, *args).result()
+
+
+def _hash_rounds(hashed_password):
+    """bcrypt 해시($2b$12$...)에 기록된 비용 값"""
+    try:
+        return int(hashed_password.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def hash_password(password):
+    return _run_hash(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)))
+
 
 def authenticate_user(username, password):
     """사용자 인증 함수"""
     user = users_collection.find_one({"username": username})
-    if user and bcrypt.checkpw(password.encode('utf-8'), user['password']):
-        return user
-    return None
+    if not user or not _run_hash(bcrypt.checkpw, password.encode('utf-8'), user['password']):
+        return None
+    # 설정된 비용과 다르게 저장된 해시는 로그인 성공 시 새 비용으로 다시 저장
+    if _hash_rounds(user['password']) != BCRYPT_ROUNDS:
+        user['password'] = hash_password(password)
+        users_collection.update_one({"_id": user['_id']}, {"$set": {"password": user['password']}})
+    return user
+
 
 def register_user(username, password):
-    """사용자 등록 함수"""
-    existing_user = users_collection.find_one({"username": username})
-    if existing_user:
+    """사용자 등록 함수 (사용자명 중복은 unique 인덱스로 판단)"""
+    hashed_password = hash_password(password)
+    try:
+        users_collection.insert_one({"username": username, "password": hashed_password})
+    except DuplicateKeyError:
         return False
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    users_collection.insert_one({"username": username, "password": hashed_password})
-    return True
\ No newline at end of file
+    return True
+
+
+def _sign(payload):
+    return hmac.new(SECRET_KEY.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def create_session_token(user):
+    """
+    새로고침/재연결 후에도 로그인을 유지하기 위한 서명된 토큰 (SECRET_KEY가 없으면 None).
+    사용자의 token_version을 포함하므로 revoke_sessions로 발급된 토큰을 모두 무효화할 수 있습니다.
+    """
+    if not SECRET_KEY:
+        return None
+    payload = f"{user['_id']}.{user.get('token_version', 0)}.{int(time.time()) + SESSION_TOKEN_TTL_SECONDS}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def restore_session(token):
+    """세션 토큰을 검증하고 사용자를 반환합니다. 서명이 틀렸거나, 만료되었거나, 폐기된 토큰이면 None"""
+    if not SECRET_KEY or not isinstance(token, str) or not token:
+        return None
+    try:
+        user_id, token_version, expires_at, signature = token.split('.')
+        if not hmac.compare_digest(signature, _sign(f"{user_id}.{token_version}.{expires_at}")):
+            return None
+        if int(expires_at) < time.time():
+            return None
+        user = get_user_by_id(ObjectId(user_id))
+        if not user or user.get('token_version', 0) != int(token_version):
+            return None
+        return user
+    except Exception as e:
+        logger.warning(f"세션 토큰 복원 실패: {str(e)}")
+        return None
+
+
+def revoke_sessions(user_id):
+    """사용자에게 발급된 세션 토큰을 모두 무효화합니다. (로그아웃, 비밀번호 변경 시)"""
+    users_collection.update_one({"_id": user_id}, {"$inc": {"token_version": 1}})
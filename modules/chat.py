@@ -0,0 +1,94 @@
+import textwrap
+import logging
+import google.generativeai as genai
+from config import GEMINI_MODEL, GENERATION_PROVIDERS, CHAT_HISTORY_TURNS
+from modules import metrics, rate_limit, nlp
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def build_context(video):
+    """영상 트랜스크립트를 대화 전체에서 재사용할 시스템 지침으로 만듭니다."""
+    passages = "\n\n".join(nlp.video_passages(video))
+    return textwrap.dedent(f"""
+    당신은 아래 YouTube 영상 "{video.get('title', 'Unknown')}"의 내용을 바탕으로 사용자와 대화하는 어시스턴트입니다.
+
+    영상 내용:
+    {passages}
+
+    질문에 답할 때 다음 지침을 따라주세요:
+    {nlp.ANSWER_GUIDELINES}
+    """)
+
+
+class ChatSession:
+    """
+    하나의 영상에 대한 다중 턴 대화.
+    트랜스크립트 컨텍스트는 세션 생성 시 한 번만 만들고, 이후 턴에서는 이를 시스템 지침으로 재사용합니다.
+    Gemini 컨텍스트 캐시는 최소 32k 토큰이 필요해 MAX_VIDEO_DURATION 이하 영상에는 쓸 수 없으므로,
+    트랜스크립트는 매 턴 함께 전송됩니다.
+    """
+
+    def __init__(self, video):
+        self.video_id = video['video_id']
+        self.title = video.get('title', 'Unknown')
+        with metrics.span("chat_context_prepare"):
+            self.context = build_context(video)
+            self.model = genai.GenerativeModel(model_name=GEMINI_MODEL, system_instruction=self.context)
+        self.history = []  # [{"role": "user" | "assistant", "content": str}]
+
+    def _recent_contents(self):
+        recent = self.history[-CHAT_HISTORY_TURNS * 2:]
+        return [
+            {"role": "model" if message["role"] == "assistant" else "user", "parts": [message["content"]]}
+            for message in recent
+        ]
+
+    def _full_prompt(self, question):
+        """다른 공급자로 페일오버할 때 사용할 단일 프롬프트"""
+        conversation = "\n".join(
+            f"{'사용자' if message['role'] == 'user' else '어시스턴트'}: {message['content']}"
+            for message in self.history[-CHAT_HISTORY_TURNS * 2:]
+        )
+        return f"{self.context}\n\n이전 대화:\n{conversation}\n\n질문: {question}\n\n답변:"
+
+    def ask(self, question):
+        """
+        질문에 대한 답변을 생성하고 대화 기록에 추가합니다.
+        Gemini와 페일오버가 모두 실패하면 오류 안내를 반환하고, 해당 턴은 기록하지 않습니다.
+        """
+        contents = self._recent_contents() + [{"role": "user", "parts": [question]}]
+        delta_text = question + "".join(message["content"] for message in self.history[-CHAT_HISTORY_TURNS * 2:])
+        tokens = rate_limit.estimate_tokens(self.context + delta_text)
+
+        try:
+            with metrics.span("llm_generation"):
+                response = rate_limit.limited_call(
+                    "gemini", GEMINI_MODEL, lambda: self.model.generate_content(contents), tokens=tokens
+                )
+            answer = response.text
+        except Exception as e:
+            logger.warning(f"Gemini 채팅 응답 실패: {str(e)}")
+            answer = self._failover(question)
+            if answer is None:
+                return nlp.describe_generation_error(e)
+
+        self.history.append({"role": "user", "content": question})
+        self.history.append({"role": "assistant", "content": answer})
+        return answer
+
+    def _failover(self, question):
+        """Gemini 이외의 공급자로 답변을 생성합니다. 대체 공급자가 없거나 모두 실패하면 None"""
+        fallback_providers = [provider for provider in GENERATION_PROVIDERS if provider != "gemini"]
+        if not fallback_providers:
+            return None
+        try:
+            with metrics.span("llm_generation"):
+                return nlp.generate_text(self._full_prompt(question), providers=fallback_providers)
+        except Exception as e:
+            logger.warning(f"채팅 페일오버 실패: {str(e)}")
+            return None
+
+    def reset(self):
+        self.history = []
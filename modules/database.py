@@ -1,45 +1,245 @@
 # database.py
 
-from pymongo import MongoClient
+import logging
+import threading
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne, UpdateMany
+from pymongo.errors import PyMongoError
 from pymongo.server_api import ServerApi
 import certifi
 from config import MONGODB_URI
 from datetime import datetime
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 # MongoDB 연결 설정
 client = MongoClient(MONGODB_URI, server_api=ServerApi('1'), tlsCAFile=certifi.where())
 db = client['youtube_transcripts']
 users_collection = db['users']
 videos_collection = db['videos']
+# 사용자-비디오 소속 정보 (사용자별 추가 일시와 태그). 비디오 문서는 사용자 수와 무관하게 크기가 유지됨
+memberships_collection = db['video_memberships']
+# 유사 중복으로 기존 영상에 연결된 비디오 ID (alias_video_id -> video_id)
+video_aliases_collection = db['video_aliases']
+
+# 목록 화면에 필요한 비디오 필드 (트랜스크립트/임베딩/구간 제외)
+VIDEO_LISTING_FIELDS = {"video_id": 1, "title": 1, "channel": 1, "duration": 1,
+                        "processed_at": 1, "transcript_length": 1}
+
+_indexes_ready = False
+_indexes_lock = threading.Lock()
+
+
+def ensure_indexes():
+    """
+    필요한 인덱스를 프로세스당 한 번 생성합니다.
+    생성에 실패한 인덱스는 로그만 남기고 넘어가므로 앱 실행은 막지 않습니다.
+    (예: 중복 사용자명이 남아 있으면 username unique 인덱스 실패 -> dedupe_usernames.py 실행 필요)
+    """
+    global _indexes_ready
+    with _indexes_lock:
+        if _indexes_ready:
+            return
+        indexes = [
+            (users_collection, "username", {"unique": True}),
+            (memberships_collection, [("user_id", ASCENDING), ("video_id", ASCENDING)], {"unique": True}),
+            (memberships_collection, [("user_id", ASCENDING), ("added_at", DESCENDING)], {}),
+            (memberships_collection, [("user_id", ASCENDING), ("tags", ASCENDING)], {}),
+            (videos_collection, "video_id", {}),
+            (videos_collection, "fingerprint.bands", {}),
+            (videos_collection, "fingerprint.title_bands", {}),
+            (video_aliases_collection, "alias_video_id", {"unique": True}),
+        ]
+        for collection, keys, options in indexes:
+            try:
+                collection.create_index(keys, **options)
+            except PyMongoError as e:
+                logger.error(f"{collection.name} 인덱스 {keys} 생성 실패: {str(e)}")
+        # 실패해도 매 rerun마다 다시 시도하지 않음 (원인 해결 후 프로세스를 재시작하면 다시 생성)
+        _indexes_ready = True
+
+
+def dedupe_usernames():
+    """
+    find-then-insert 경쟁으로 생긴 중복 사용자명을 정리합니다. 가장 먼저 만들어진 계정을 남기고,
+    나머지 계정의 영상 소속 정보(태그 포함)와 피드백을 그 계정으로 옮긴 뒤 삭제합니다. 여러 번 실행해도 안전합니다.
+    """
+    merged_users = 0
+    duplicates = users_collection.aggregate([
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": "$username", "user_ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    for duplicate in duplicates:
+        kept_user_id, removed_user_ids = duplicate["user_ids"][0], duplicate["user_ids"][1:]
+        operations = [
+            UpdateOne(
+                {"user_id": kept_user_id, "video_id": membership["video_id"]},
+                {"$setOnInsert": {"added_at": membership.get("added_at") or datetime.utcnow()},
+                 "$addToSet": {"tags": {"$each": membership.get("tags") or []}}},
+                upsert=True
+            )
+            for membership in memberships_collection.find({"user_id": {"$in": removed_user_ids}})
+        ]
+        if operations:
+            memberships_collection.bulk_write(operations, ordered=False)
+        memberships_collection.delete_many({"user_id": {"$in": removed_user_ids}})
+        db['feedback'].update_many({"user_id": {"$in": removed_user_ids}}, {"$set": {"user_id": kept_user_id}})
+        users_collection.delete_many({"_id": {"$in": removed_user_ids}})
+        merged_users += len(removed_user_ids)
+        logger.info(f"사용자명 '{duplicate['_id']}'의 중복 계정 {len(removed_user_ids)}개를 {kept_user_id}로 합쳤습니다.")
+    return merged_users
+
+
+def get_user_by_id(user_id):
+    """세션 토큰 복원용 사용자 조회"""
+    return users_collection.find_one({"_id": user_id})
+
+
+def get_user_by_username(username):
+    return users_collection.find_one({"username": username})
+
 
 def get_video_info_from_db(video_ids):
     """데이터베이스에서 여러 비디오 정보 조회"""
     return list(videos_collection.find({"video_id": {"$in": video_ids}}))
 
 
+def get_video_segments(video_id, skip=0, limit=50):
+    """비디오의 시간 구간 중 일부만 가져오기 (전체 트랜스크립트는 불러오지 않음)"""
+    return videos_collection.find_one(
+        {"video_id": video_id},
+        {"title": 1, "channel": 1, "video_id": 1, "segment_count": 1,
+         "segments": {"$slice": [skip, limit]}}
+    )
+
+
+def find_fingerprint_candidates(bands, title_bands, duration, limit=20):
+    """
+    LSH 밴드가 하나라도 겹치는 비디오 (제목 밴드는 길이가 ±10% 이내인 경우만).
+    밴드 하나만 우연히 겹치는 무관한 영상이 많으므로, 겹치는 밴드가 많은 순으로 정렬한 뒤 limit개만 반환합니다.
+    """
+    clauses = []
+    if bands:
+        clauses.append({"fingerprint.bands": {"$in": bands}})
+    if title_bands and duration:
+        clauses.append({
+            "fingerprint.title_bands": {"$in": title_bands},
+            "duration": {"$gte": duration * 0.9, "$lte": duration * 1.1}
+        })
+    if not clauses:
+        return []
+    return list(videos_collection.aggregate([
+        {"$match": {"$or": clauses}},
+        {"$project": {
+            "video_id": 1, "title": 1, "channel": 1, "duration": 1, "fingerprint": 1,
+            "shared_bands": {"$size": {"$setIntersection": [{"$ifNull": ["$fingerprint.bands", []]}, bands]}},
+            "shared_title_bands": {"$size": {"$setIntersection": [
+                {"$ifNull": ["$fingerprint.title_bands", []]}, title_bands]}},
+        }},
+        {"$sort": {"shared_bands": -1, "shared_title_bands": -1}},
+        {"$limit": limit},
+    ]))
+
+
+def add_video_alias(alias_video_id, video_id):
+    """다른 비디오 ID를 기존 비디오에 연결"""
+    video_aliases_collection.update_one(
+        {"alias_video_id": alias_video_id},
+        {"$set": {"video_id": video_id, "created_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+
+def get_video_alias(alias_video_id):
+    """연결된 기존 비디오 ID (없으면 None)"""
+    alias = video_aliases_collection.find_one({"alias_video_id": alias_video_id})
+    return alias["video_id"] if alias else None
+
+
+def add_video_for_user(user_id, video_id):
+    """사용자 목록에 비디오 추가 (이미 있으면 변경 없음)"""
+    memberships_collection.update_one(
+        {"user_id": user_id, "video_id": video_id},
+        {"$setOnInsert": {"added_at": datetime.utcnow(), "tags": []}},
+        upsert=True
+    )
+
+
 def get_user_videos(user_id, selected_tags=None, start_date=None, end_date=None, show_no_tags=False):
-    """사용자의 처리된 비디오 목록 가져오기 (필터링 포함)"""
-    query = {"user_ids": user_id}
+    """사용자의 처리된 비디오 목록 가져오기 (필터링 포함, 최근 추가 순)"""
+    query = {"user_id": user_id}
 
     if show_no_tags:
-        query["$or"] = [{"tags": {"$exists": False}}, {"tags": []}]
+        query["tags"] = {"$size": 0}
     elif selected_tags:
         query["tags"] = {"$in": selected_tags}
 
     if start_date and end_date:
-        query["processed_at"] = {
+        query["added_at"] = {
             "$gte": start_date,
             "$lte": end_date
         }
 
-    return list(videos_collection.find(query))
+    memberships = list(memberships_collection.find(query).sort("added_at", DESCENDING))
+    videos = {
+        video["video_id"]: video
+        for video in videos_collection.find(
+            {"video_id": {"$in": [m["video_id"] for m in memberships]}}, VIDEO_LISTING_FIELDS
+        )
+    }
+
+    result = []
+    for membership in memberships:
+        video = videos.get(membership["video_id"])
+        if video:
+            result.append(dict(video, tags=membership.get("tags", []), added_at=membership["added_at"]))
+    return result
+
 
+def get_user_video_ids_by_tags(user_id, tags):
+    """사용자가 해당 태그를 붙인 비디오 ID 목록"""
+    return [
+        membership["video_id"]
+        for membership in memberships_collection.find(
+            {"user_id": user_id, "tags": {"$in": tags}}, {"video_id": 1, "_id": 0}
+        )
+    ]
 
-def remove_tag_from_video(video_id, tag):
+
+def save_feedback(user_id, feedback):
+    """피드백을 데이터베이스에 저장합니다."""
+    feedback_data = {
+        "user_id": user_id,
+        "feedback": feedback,
+        "timestamp": datetime.utcnow()
+    }
+    db['feedback'].insert_one(feedback_data)
+
+
+# 비디오당 최대 태그 수
+MAX_TAGS_PER_VIDEO = 3
+
+
+def _tag_limit_filter():
+    """태그가 MAX_TAGS_PER_VIDEO개 미만인 문서만 일치시키는 조건"""
+    return {f"tags.{MAX_TAGS_PER_VIDEO - 1}": {"$exists": False}}
+
+
+def add_tag_to_video(user_id, video_id, tag):
+    """비디오에 태그 추가 (사용자별, 최대 3개). 개수 제한을 조건에 넣어 한 번의 원자적 업데이트로 처리"""
+    result = memberships_collection.update_one(
+        {"user_id": user_id, "video_id": video_id, **_tag_limit_filter()},
+        {"$addToSet": {"tags": tag}}
+    )
+    return result.matched_count > 0
+
+
+def remove_tag_from_video(user_id, video_id, tag):
     """비디오에서 태그 제거"""
     try:
-        result = videos_collection.update_one(
-            {"video_id": video_id},
+        result = memberships_collection.update_one(
+            {"user_id": user_id, "video_id": video_id},
             {"$pull": {"tags": tag}}
         )
         if result.modified_count > 0:
@@ -52,41 +252,115 @@ def remove_tag_from_video(video_id, tag):
         logger.error(f"태그 제거 중 오류 발생: {str(e)}")
         return False
 
-def save_feedback(user_id, feedback):
-    """피드백을 데이터베이스에 저장합니다."""
-    feedback_data = {
-        "user_id": user_id,
-        "feedback": feedback,
-        "timestamp": datetime.utcnow()
-    }
-    db['feedback'].insert_one(feedback_data)
 
+def bulk_update_tags(user_id, video_ids, add_tags=(), remove_tags=()):
+    """
+    여러 비디오의 태그를 한 번의 bulk_write로 추가/제거합니다.
+    제거가 먼저 적용되고, 추가는 태그 수가 제한 미만인 비디오에만 적용됩니다.
+    변경된 문서 수를 반환합니다.
+    """
+    if not video_ids:
+        return 0
+    base_filter = {"user_id": user_id, "video_id": {"$in": list(video_ids)}}
+    operations = []
+    if remove_tags:
+        operations.append(UpdateMany(base_filter, {"$pull": {"tags": {"$in": list(remove_tags)}}}))
+    for tag in add_tags:
+        operations.append(UpdateMany({**base_filter, **_tag_limit_filter()}, {"$addToSet": {"tags": tag}}))
+    if not operations:
+        return 0
+    result = memberships_collection.bulk_write(operations, ordered=True)
+    return result.modified_count
 
-def add_tag_to_video(video_id, tag):
-    """비디오에 태그 추가 (최대 3개)"""
-    video = videos_collection.find_one({"video_id": video_id})
-    if video and len(video.get("tags", [])) < 3:
-        videos_collection.update_one(
-            {"video_id": video_id},
-            {"$addToSet": {"tags": tag}}
-        )
-        return True
-    return False
 
+def get_tag_counts(user_id):
+    """사용자의 태그별 비디오 수 (많은 순)를 집계로 계산"""
+    pipeline = [
+        {"$match": {"user_id": user_id, "tags.0": {"$exists": True}}},
+        {"$unwind": "$tags"},
+        {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+    ]
+    return {row["_id"]: row["count"] for row in memberships_collection.aggregate(pipeline) if row["_id"] is not None}
 
-def remove_tag_from_video(video_id, tag):
-    """비디오에서 태그 제거"""
-    videos_collection.update_one(
-        {"video_id": video_id},
-        {"$pull": {"tags": tag}}
-    )
 
+def get_all_tags(user_id):
+    """사용자가 사용한 모든 고유 태그 가져오기 (많이 쓴 순)"""
+    return list(get_tag_counts(user_id))
+
+
+# 다수 영상 질문 시 한 번에 가져올 문서 수 (커서 배치 크기)
+STREAM_BATCH_SIZE = 20
+
+
+def get_videos_by_ids(video_ids):
+    """비디오 목록 가져오기 (목록 표시용 필드만). ID는 get_user_video_ids_by_tags로 한 번만 조회해 넘깁니다."""
+    return list(videos_collection.find(
+        {"video_id": {"$in": video_ids}},
+        {"video_id": 1, "title": 1, "channel": 1}
+    ))
+
+
+def iter_video_digests(video_ids):
+    """비디오의 요약 필드만 커서로 하나씩 가져오기 (요약이 없으면 트랜스크립트 앞부분)"""
+    return videos_collection.find(
+        {"video_id": {"$in": video_ids}},
+        {"video_id": 1, "title": 1, "summary": 1, "key_points": 1,
+         "transcript_head": {"$substrCP": [{"$ifNull": ["$transcript", ""]}, 0, 2000]}}
+    ).batch_size(STREAM_BATCH_SIZE)
+
+
+def iter_video_transcripts(video_ids):
+    """
+    여러 비디오의 구간만 커서로 하나씩 가져오기 (임베딩 등 다른 필드는 제외).
+    구간이 없는 이전 문서만 전체 트랜스크립트를 함께 가져옵니다.
+    """
+    return videos_collection.find(
+        {"video_id": {"$in": video_ids}},
+        {"video_id": 1, "title": 1, "segments": 1,
+         "transcript": {"$cond": [{"$gt": [{"$size": {"$ifNull": ["$segments", []]}}, 0]},
+                                  "$$REMOVE", "$transcript"]}}
+    ).batch_size(STREAM_BATCH_SIZE)
+
+
+def migrate_user_ids_to_memberships(batch_size=500):
+    """
+    기존 videos.user_ids 배열과 전역 tags를 video_memberships 컬렉션으로 옮기고,
+    비디오 문서에서 두 필드를 제거합니다. 여러 번 실행해도 안전합니다.
+    """
+    ensure_indexes()
+    migrated_videos = 0
+    upserted = 0
+    cursor = videos_collection.find(
+        {"user_ids": {"$exists": True}},
+        {"video_id": 1, "user_ids": 1, "tags": 1, "processed_at": 1, "created_at": 1}
+    ).batch_size(batch_size)
+
+    operations = []
+    video_ids = []
+
+    def flush():
+        nonlocal upserted, migrated_videos
+        if operations:
+            upserted += memberships_collection.bulk_write(operations, ordered=False).upserted_count
+        if video_ids:
+            videos_collection.update_many({"_id": {"$in": video_ids}}, {"$unset": {"user_ids": "", "tags": ""}})
+            migrated_videos += len(video_ids)
+        operations.clear()
+        video_ids.clear()
 
-def get_all_tags():
-    """모든 고유 태그 가져오기"""
-    all_tags = videos_collection.distinct("tags")
-    return [tag for tag in all_tags if tag is not None]  # None 값 제거
+    for video in cursor:
+        added_at = video.get("processed_at") or video.get("created_at") or datetime.utcnow()
+        for user_id in video.get("user_ids") or []:
+            operations.append(UpdateOne(
+                {"user_id": user_id, "video_id": video["video_id"]},
+                {"$setOnInsert": {"added_at": added_at, "tags": list(video.get("tags") or [])}},
+                upsert=True
+            ))
+        video_ids.append(video["_id"])
+        if len(operations) >= batch_size or len(video_ids) >= batch_size:
+            flush()
+    flush()
 
-def get_videos_by_tags(tags):
-    """태그 리스트에 해당하는 비디오 정보 가져오기"""
-    return list(videos_collection.find({"tags": {"$in": tags}}))
\ No newline at end of file
+    logger.info(f"마이그레이션 완료: 비디오 {migrated_videos}개, 새 소속 정보 {upserted}개")
+    return migrated_videos, upserted
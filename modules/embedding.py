@@ -0,0 +1,135 @@
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+import tiktoken
+from openai import OpenAI
+from config import (OPENAI_API_KEY, EMBEDDING_MODEL, EMBEDDING_BATCH_WINDOW_SECONDS,
+                    EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_MAX_BATCH_TOKENS, API_RATE_LIMITS, DEFAULT_RATE_LIMIT)
+from modules import metrics, rate_limit
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+client = OpenAI(api_key=OPENAI_API_KEY)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+WAIT_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+class EmbeddingBatcher:
+    """
+    여러 세션/스레드에서 들어오는 임베딩 요청을 짧은 시간 동안 모아 한 번의 API 호출로 보내고,
+    결과를 각 요청자에게 돌려줍니다. 배치는 스레드 하나가 모으고, 전송은 모델의 동시 호출 한도만큼의
+    작업 스레드가 나눠 맡으므로 한 배치가 429 백오프로 멈춰도 다음 배치는 계속 나갑니다.
+    """
+
+    def __init__(self, model=EMBEDDING_MODEL, window=EMBEDDING_BATCH_WINDOW_SECONDS,
+                 max_batch_size=EMBEDDING_MAX_BATCH_SIZE, max_batch_tokens=EMBEDDING_MAX_BATCH_TOKENS):
+        self.model = model
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        # 한국어는 글자 수 기반 추정이 실제 토큰 수보다 적게 나오므로 요청 한도는 실제 토크나이저로 계산
+        self.encoder = tiktoken.encoding_for_model(model)
+        max_concurrency = API_RATE_LIMITS.get(f"openai:{model}", DEFAULT_RATE_LIMIT)["max_concurrency"]
+        self.senders = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding-sender")
+        # 모든 전송 스레드가 바쁘면 모으기를 멈춰 대기열에서 더 큰 배치가 만들어지게 함
+        self.sender_slots = threading.Semaphore(max_concurrency)
+        self.queue = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.worker.start()
+
+    def submit(self, text):
+        """임베딩 요청을 대기열에 넣고 결과를 받을 Future를 반환합니다."""
+        future = Future()
+        self.queue.put((text, future, time.perf_counter(), len(self.encoder.encode(text))))
+        metrics.set_gauge("embedding_queue_depth", self.queue.qsize(), model=self.model)
+        return future
+
+    def embed_many(self, texts):
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def embed(self, text):
+        return self.submit(text).result()
+
+    def _collect(self):
+        """첫 요청이 도착한 뒤 window 동안 또는 한도에 도달할 때까지 요청을 모읍니다."""
+        first = self.queue.get()
+        batch = [first]
+        tokens = first[3]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            item_tokens = item[3]
+            if tokens + item_tokens > self.max_batch_tokens:
+                # 다음 배치의 첫 요청으로 돌려보냄
+                self.queue.put(item)
+                break
+            batch.append(item)
+            tokens += item_tokens
+        return batch, tokens
+
+    def _run(self):
+        while True:
+            self.sender_slots.acquire()
+            batch, tokens = self._collect()
+            metrics.set_gauge("embedding_queue_depth", self.queue.qsize(), model=self.model)
+            self.senders.submit(self._send, batch, tokens)
+
+    def _send(self, batch, tokens):
+        try:
+            sent_at = time.perf_counter()
+            for _, _, enqueued_at, _ in batch:
+                metrics.observe("embedding_wait_seconds", sent_at - enqueued_at, buckets=WAIT_BUCKETS, model=self.model)
+            metrics.observe("embedding_batch_size", len(batch), buckets=BATCH_SIZE_BUCKETS, model=self.model)
+
+            texts = [text for text, _, _, _ in batch]
+            try:
+                response = rate_limit.limited_call(
+                    "openai", self.model,
+                    lambda: client.embeddings.create(input=texts, model=self.model),
+                    tokens=tokens
+                )
+                vectors = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except Exception as e:
+                logger.error(f"임베딩 배치 요청 중 오류 발생: {str(e)}")
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                return
+
+            for (_, future, _, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+        finally:
+            self.sender_slots.release()
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """프로세스 전체에서 공유하는 임베딩 배처를 반환합니다."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = EmbeddingBatcher()
+        return _batcher
+
+
+def embed(text):
+    """텍스트 하나를 임베딩합니다."""
+    return get_batcher().embed(text)
+
+
+def embed_many(texts):
+    """여러 텍스트를 임베딩합니다. 다른 요청과 함께 배치로 묶일 수 있습니다."""
+    return get_batcher().embed_many(texts)
@@ -0,0 +1,88 @@
+import re
+import zlib
+import numpy as np
+
+# MinHash 설정: 64개 해시를 32개 밴드(밴드당 2행)로 나눠 LSH 인덱스 키로 사용
+# 밴드당 행 수가 적을수록 잘라낸 클립처럼 Jaccard가 낮은 쌍도 후보로 잡히며, 최종 판정은 서명 비교로 함
+NUM_PERM = 64
+NUM_BANDS = 32
+TITLE_NUM_PERM = 16
+TITLE_NUM_BANDS = 8
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = np.random.RandomState(1)
+# a, b는 소수 전체 범위에서 뽑음. a가 작으면 (a * x + b) mod p가 x에 대해 거의 단조 증가해서
+# 최솟값이 해시값이 가장 작은 shingle에 몰리고 유사도 추정이 크게 틀어짐. (uint64 곱의 오버플로는 허용)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize_text(text):
+    """대소문자, 문장부호, 공백 차이를 없앱니다."""
+    return re.sub(r'[\W_]+', '', (text or '').lower())
+
+
+def content_shingles(text, k=SHINGLE_SIZE):
+    """공백을 제거한 텍스트의 글자 k-gram 집합 (한국어처럼 띄어쓰기가 불규칙한 자막에도 안정적)"""
+    normalized = normalize_text(text)
+    if len(normalized) < k:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+
+def title_shingles(title):
+    """제목의 단어 집합"""
+    return {word for word in re.split(r'[\W_]+', (title or '').lower()) if word}
+
+
+def minhash_signature(shingles, num_perm=NUM_PERM):
+    """shingle 집합의 MinHash 서명을 계산합니다."""
+    if not shingles:
+        return []
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (np.outer(hashes, _PERM_A[:num_perm]) + _PERM_B[:num_perm]) % np.uint64(_MERSENNE_PRIME)
+    return [int(value) for value in permuted.min(axis=0)]
+
+
+def lsh_bands(signature, num_bands):
+    """서명을 밴드로 나눈 인덱스 키 목록. 키 하나라도 같으면 유사 후보로 봅니다."""
+    if not signature:
+        return []
+    rows = len(signature) // num_bands
+    return [
+        f"{band}:{zlib.crc32(','.join(map(str, signature[band * rows:(band + 1) * rows])).encode()):08x}"
+        for band in range(num_bands)
+    ]
+
+
+def estimate_jaccard(signature_a, signature_b):
+    """두 MinHash 서명이 일치하는 비율로 Jaccard 유사도를 추정합니다."""
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / len(signature_a)
+
+
+def estimate_containment(jaccard, size_a, size_b):
+    """
+    작은 집합이 큰 집합에 포함된 비율을 추정합니다.
+    잘라낸 클립처럼 한쪽이 다른 쪽의 일부인 경우 Jaccard는 낮아도 포함도는 높습니다.
+    """
+    smaller = min(size_a, size_b)
+    if not smaller:
+        return 0.0
+    return min(1.0, jaccard * (size_a + size_b) / ((1 + jaccard) * smaller))
+
+
+def compute_fingerprint(title, transcript=None):
+    """비디오 문서에 저장할 지문. 트랜스크립트가 없으면 제목 지문만 계산합니다."""
+    shingles = content_shingles(transcript) if transcript else set()
+    signature = minhash_signature(shingles)
+    title_signature = minhash_signature(title_shingles(title), TITLE_NUM_PERM)
+    return {
+        "signature": signature,
+        "bands": lsh_bands(signature, NUM_BANDS),
+        "shingle_count": len(shingles),
+        "title_signature": title_signature,
+        "title_bands": lsh_bands(title_signature, TITLE_NUM_BANDS),
+    }
@@ -0,0 +1,310 @@
+import threading
+import time
+import uuid
+import logging
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 프로세스 전체에서 공유되는 최근 스팬 기록 (오래된 항목부터 버려짐)
+MAX_SPANS = 5000
+# 지연 시간 히스토그램 구간 (초)
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+
+_spans = deque(maxlen=MAX_SPANS)
+_gauges = {}
+_counters = defaultdict(float)
+_histograms = {}
+_stage_totals = defaultdict(lambda: {"sum": 0.0, "count": 0, "errors": 0})  # 링 버퍼와 달리 프로세스 시작 이후 누적
+_lock = threading.Lock()
+_current_request = contextvars.ContextVar("current_request", default=None)
+_metrics_server = None
+
+
+@contextmanager
+def request(kind, user_id=None, video_id=None):
+    """하나의 요청(수집/답변)을 묶는 컨텍스트. 중첩되면 바깥 요청을 재사용합니다."""
+    current = _current_request.get()
+    if current is not None:
+        bind(user_id=user_id, video_id=video_id)
+        yield current
+        return
+
+    ctx = {
+        "request_id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "user_id": str(user_id) if user_id is not None else None,
+        "video_id": video_id,
+    }
+    token = _current_request.set(ctx)
+    try:
+        with span(f"{kind}_total"):
+            yield ctx
+    finally:
+        _current_request.reset(token)
+
+
+def bind(user_id=None, video_id=None):
+    """진행 중인 요청에 사용자/비디오 정보를 추가합니다."""
+    current = _current_request.get()
+    if current is None:
+        return
+    if user_id is not None:
+        current["user_id"] = str(user_id)
+    if video_id is not None:
+        current["video_id"] = video_id
+
+
+@contextmanager
+def span(stage):
+    """파이프라인 단계의 소요 시간을 기록합니다."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_span(stage, time.perf_counter() - start, status)
+
+
+def record_span(stage, duration, status="ok"):
+    """완료된 스팬 하나를 저장합니다."""
+    ctx = _current_request.get() or {}
+    entry = {
+        "stage": stage,
+        "duration": duration,
+        "status": status,
+        "request_id": ctx.get("request_id"),
+        "kind": ctx.get("kind"),
+        "user_id": ctx.get("user_id"),
+        "video_id": ctx.get("video_id"),
+        "timestamp": datetime.utcnow(),
+    }
+    with _lock:
+        _spans.append(entry)
+        totals = _stage_totals[stage]
+        totals["sum"] += duration
+        totals["count"] += 1
+        if status != "ok":
+            totals["errors"] += 1
+
+
+def _metric_key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def set_gauge(name, value, **labels):
+    """현재 값을 나타내는 게이지(대기열 길이 등)를 설정합니다."""
+    with _lock:
+        _gauges[_metric_key(name, labels)] = value
+
+
+def inc_counter(name, amount=1, **labels):
+    """누적 카운터를 증가시킵니다."""
+    with _lock:
+        _counters[_metric_key(name, labels)] += amount
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """히스토그램에 관측값 하나를 추가합니다."""
+    key = _metric_key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = {"buckets": tuple(buckets), "counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+            _histograms[key] = histogram
+        index = next((i for i, bound in enumerate(histogram["buckets"]) if value <= bound), len(histogram["buckets"]))
+        histogram["counts"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def _bucket_quantile(histogram, q):
+    """구간 상한값 기준으로 분위수를 근사합니다. 마지막 구간을 넘으면 inf를 반환합니다."""
+    if not histogram["count"]:
+        return 0.0
+    target = q * histogram["count"]
+    cumulative = 0
+    for bound, count in zip(histogram["buckets"], histogram["counts"]):
+        cumulative += count
+        if cumulative >= target:
+            return bound
+    return float("inf")
+
+
+def get_histograms():
+    """히스토그램을 (이름, 라벨, 히스토그램) 목록으로 반환합니다."""
+    with _lock:
+        return [(name, dict(labels), dict(h, counts=list(h["counts"]))) for (name, labels), h in sorted(_histograms.items())]
+
+
+def summarize_histograms():
+    """히스토그램별 호출 수, 평균, 근사 p50/p95/p99를 계산합니다."""
+    rows = []
+    for name, labels, histogram in get_histograms():
+        rows.append({
+            "metric": name,
+            **labels,
+            "count": histogram["count"],
+            "avg": histogram["sum"] / histogram["count"] if histogram["count"] else 0.0,
+            "p50": _bucket_quantile(histogram, 0.5),
+            "p95": _bucket_quantile(histogram, 0.95),
+            "p99": _bucket_quantile(histogram, 0.99),
+        })
+    return rows
+
+
+def get_gauges():
+    """게이지 값을 (이름, 라벨, 값) 목록으로 반환합니다."""
+    with _lock:
+        return [(name, dict(labels), value) for (name, labels), value in sorted(_gauges.items())]
+
+
+def get_counters():
+    """카운터 값을 (이름, 라벨, 값) 목록으로 반환합니다."""
+    with _lock:
+        return [(name, dict(labels), value) for (name, labels), value in sorted(_counters.items())]
+
+
+def get_stage_totals():
+    """단계별 누적 소요 시간 합계, 호출 수, 오류 수를 반환합니다. (값이 줄어들지 않음)"""
+    with _lock:
+        return {stage: dict(totals) for stage, totals in sorted(_stage_totals.items())}
+
+
+def _format_labels(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def get_spans(limit=None):
+    """기록된 스팬을 최신순으로 반환합니다."""
+    with _lock:
+        spans = list(_spans)
+    spans.reverse()
+    return spans[:limit] if limit else spans
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_spans():
+    """단계별 호출 수, 오류 수, 평균/p50/p95/최대 소요 시간을 계산합니다."""
+    by_stage = defaultdict(list)
+    errors = defaultdict(int)
+    for entry in get_spans():
+        by_stage[entry["stage"]].append(entry["duration"])
+        if entry["status"] != "ok":
+            errors[entry["stage"]] += 1
+
+    summary = []
+    for stage, durations in by_stage.items():
+        durations.sort()
+        summary.append({
+            "stage": stage,
+            "count": len(durations),
+            "errors": errors[stage],
+            "total": sum(durations),
+            "avg": sum(durations) / len(durations),
+            "p50": _percentile(durations, 0.5),
+            "p95": _percentile(durations, 0.95),
+            "max": durations[-1],
+        })
+    summary.sort(key=lambda row: row["total"], reverse=True)
+    return summary
+
+
+def summarize_requests(limit=50):
+    """요청 단위로 단계별 소요 시간을 묶어 최신순으로 반환합니다."""
+    requests = {}
+    for entry in get_spans():
+        request_id = entry["request_id"]
+        if request_id is None:
+            continue
+        row = requests.setdefault(request_id, {
+            "request_id": request_id,
+            "kind": entry["kind"],
+            "user_id": entry["user_id"],
+            "video_id": entry["video_id"],
+            "timestamp": entry["timestamp"],
+        })
+        row[entry["stage"]] = round(row.get(entry["stage"], 0.0) + entry["duration"], 3)
+    return list(requests.values())[:limit]
+
+
+def render_text():
+    """
+    Prometheus 텍스트 형식으로 단계별 지표를 출력합니다.
+    분위수는 최근 스팬 기준이고, _sum/_count/오류 수는 카운터처럼 줄어들지 않는 누적값입니다.
+    """
+    lines = [
+        "# HELP askontube_stage_duration_seconds 파이프라인 단계별 소요 시간",
+        "# TYPE askontube_stage_duration_seconds summary",
+    ]
+    quantiles = {row["stage"]: row for row in summarize_spans()}
+    for stage, totals in get_stage_totals().items():
+        label = f'stage="{stage}"'
+        row = quantiles.get(stage)
+        if row:
+            lines.append(f'askontube_stage_duration_seconds{{{label},quantile="0.5"}} {row["p50"]:.6f}')
+            lines.append(f'askontube_stage_duration_seconds{{{label},quantile="0.95"}} {row["p95"]:.6f}')
+        lines.append(f"askontube_stage_duration_seconds_sum{{{label}}} {totals['sum']:.6f}")
+        lines.append(f"askontube_stage_duration_seconds_count{{{label}}} {totals['count']}")
+        lines.append(f"askontube_stage_errors_total{{{label}}} {totals['errors']}")
+    for name, labels, value in get_gauges():
+        lines.append(f"askontube_{name}{{{_format_labels(labels)}}} {value}")
+    for name, labels, value in get_counters():
+        lines.append(f"askontube_{name}_total{{{_format_labels(labels)}}} {value:g}")
+    for name, labels, histogram in get_histograms():
+        prefix = _format_labels(labels) + "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            cumulative += count
+            lines.append(f'askontube_{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'askontube_{name}_bucket{{{prefix}le="+Inf"}} {histogram["count"]}')
+        lines.append(f"askontube_{name}_sum{{{_format_labels(labels)}}} {histogram['sum']:.6f}")
+        lines.append(f"askontube_{name}_count{{{_format_labels(labels)}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port):
+    """/metrics 엔드포인트를 백그라운드 스레드에서 한 번만 실행합니다."""
+    global _metrics_server
+    with _lock:
+        if _metrics_server is not None or not port:
+            return _metrics_server
+        try:
+            _metrics_server = ThreadingHTTPServer(("0.0.0.0", int(port)), _MetricsHandler)
+        except OSError as e:
+            logger.error(f"메트릭 서버 시작 중 오류 발생: {str(e)}")
+            return None
+    threading.Thread(target=_metrics_server.serve_forever, daemon=True).start()
+    logger.info(f"메트릭 서버가 포트 {port}에서 시작되었습니다.")
+    return _metrics_server
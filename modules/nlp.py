@@ -1,10 +1,20 @@
 from openai import OpenAI
 import google.generativeai as genai
-from config import OPENAI_API_KEY, GEMINI_API_KEY
+from config import (OPENAI_API_KEY, GEMINI_API_KEY, GEMINI_MODEL, OPENAI_CHAT_MODEL,
+                    GENERATION_PROVIDERS, HEDGE_DELAY_SECONDS, GENERATION_WORKERS, HEDGE_WORKERS,
+                    MAP_REDUCE_TOP_VIDEOS, MAP_REDUCE_TOP_PASSAGES, MAP_REDUCE_TOKEN_BUDGET)
 import textwrap
-from sklearn.feature_extraction.text import TfidfVectorizer
+import json
+import re
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import heapq
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from modules import metrics, rate_limit, embedding
 
 # OpenAI 클라이언트 초기화
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
@@ -12,36 +22,75 @@ openai_client = OpenAI(api_key=OPENAI_API_KEY)
 # Gemini API 설정
 genai.configure(api_key=GEMINI_API_KEY)
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 주 모델 요청을 실행하는 공유 스레드 풀
+_generation_executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="llm")
+# 헤지/페일오버 요청 전용 스레드 풀 (주 요청이 풀을 가득 채워도 보조 요청이 그 뒤에 줄 서지 않도록)
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
 def transcribe_audio(file_path):
     """오디오 파일을 텍스트로 변환"""
-    with open(file_path, "rb") as audio_file:
-        transcript = openai_client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file
-        )
+    def request():
+        with open(file_path, "rb") as audio_file:
+            return openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file
+            )
+
+    transcript = rate_limit.limited_call("openai", "whisper-1", request)
     return transcript.text
 
 def embed_text(text):
     """텍스트를 벡터로 임베딩"""
-    response = openai_client.embeddings.create(input=[text], model="text-embedding-ada-002")
-    return response.data[0].embedding
+    return embedding.embed(text)
 
 
-def generate_response(query, transcripts):
-    """여러 트랜스크립트를 기반으로 질문에 대한 응답 생성"""
-    model = genai.GenerativeModel(model_name="models/gemini-1.5-pro-latest")
+# 자막/음성 구간을 검색 단위로 묶을 때의 최대 길이 (초)와 답변에 사용할 문단 수
+PASSAGE_WINDOW_SECONDS = 60
+PASSAGE_TOP_K = 12
 
-    relevant_parts = process_multiple_transcripts(query, transcripts)
-    combined_transcript = "\n\n".join(relevant_parts)
 
-    prompt = textwrap.dedent(f"""
-    다음은 여러 YouTube 비디오의 관련 내용입니다:
+def format_timestamp(seconds):
+    """초 단위의 시간을 영상 타임스탬프 형식(mm:ss 또는 h:mm:ss)으로 변환합니다."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
 
-    {combined_transcript}
 
-    질문: {query}
+def video_passages(video, window_seconds=PASSAGE_WINDOW_SECONDS):
+    """
+    비디오의 시간 구간을 window_seconds 단위의 검색용 문단으로 묶습니다.
+    각 문단에는 해당 시점으로 이동하는 링크가 붙습니다. 구간 정보가 없는 이전 데이터는 전체 트랜스크립트를 그대로 사용합니다.
+    """
+    segments = video.get('segments') or []
+    if not segments:
+        return [video['transcript']] if video.get('transcript') else []
 
-    위의 내용을 바탕으로 질문에 답변해주세요. 답변 시 다음 지침을 따라주세요:
+    title = video.get('title', 'Unknown')
+    passages = []
+    window_start = None
+    texts = []
+    for segment in segments:
+        if window_start is None:
+            window_start = segment['start']
+        texts.append(segment['text'])
+        if segment['end'] - window_start >= window_seconds:
+            passages.append(_passage(video['video_id'], title, window_start, texts))
+            window_start, texts = None, []
+    if texts:
+        passages.append(_passage(video['video_id'], title, window_start, texts))
+    return passages
+
+
+def _passage(video_id, title, start, texts):
+    link = f"https://www.youtube.com/watch?v={video_id}&t={int(start)}s"
+    return f"[{title} {format_timestamp(start)}]({link}) {' '.join(texts)}"
+
+
+# 모든 답변 프롬프트에 공통으로 들어가는 지침
+ANSWER_GUIDELINES = textwrap.dedent("""
     1. 주어진 내용에서 직접적으로 관련된 정보를 찾아 상세하게 답변하세요.
     2. 필요한 경우 풍부한 설명과 예시를 포함하여 답변하세요.
     3. 정보가 부족하거나 관련이 없는 경우, "제공된 내용에는 이 질문에 답할 만한 충분한 정보가 없습니다."라고 명시한 후, 기존 지식을 활용하여 일반적인 수준의 추가 정보를 제공하세요.
@@ -49,26 +98,275 @@ def generate_response(query, transcripts):
     5. 의학적 조언이나 전문적인 내용을 다룰 때는 "영상에서 언급된 바에 따르면"이라는 문구로 시작하고, 추가적인 전문가 상담을 권고하세요.
     6. 긴 답변을 제공하는 경우 마지막 문잔에 주요 포인트를 요약하고, 추가 학습이나 탐구를 위한 제안을 포함하세요.
     7. 답변의 깊이, 양이 구체적으로 명시되지 않은 질문에 대해서는 기본적으로 10줄 이상의 구체적 답변을 하세요.
+    8. 내용 앞에 [제목 mm:ss](링크) 형식의 시간 정보가 있으면, 인용한 부분의 링크를 답변에 그대로 포함하여 해당 장면으로 이동할 수 있게 하세요.
+""").strip()
+
+
+def generate_response(query, transcripts, top_k=5):
+    """여러 트랜스크립트(또는 시간 구간 문단)를 기반으로 질문에 대한 응답 생성"""
+    with metrics.span("retrieval"):
+        relevant_parts = process_multiple_transcripts(query, transcripts, top_k=top_k)
+    combined_transcript = "\n\n".join(relevant_parts)
+
+    prompt = textwrap.dedent(f"""
+    다음은 여러 YouTube 비디오의 관련 내용입니다:
+
+    {combined_transcript}
+
+    질문: {query}
+
+    위의 내용을 바탕으로 질문에 답변해주세요. 답변 시 다음 지침을 따라주세요:
+    {ANSWER_GUIDELINES}
 
     답변:
     """)
 
     try:
-        response = model.generate_content(prompt)
-        return response.text
-    except genai.types.generation_types.BlockedPromptException:
-        return "죄송합니다. 이 질문에 대한 응답을 생성할 수 없습니다. 다른 방식으로 질문을 표현해 보시겠습니까?"
+        with metrics.span("llm_generation"):
+            return generate_text(prompt)
     except Exception as e:
-        return f"응답 생성 중 오류 발생: {str(e)}"
+        return describe_generation_error(e)
+
 
+def describe_generation_error(error):
+    """답변 생성 중 발생한 예외를 사용자에게 보여줄 메시지로 변환합니다."""
+    if isinstance(error, genai.types.generation_types.BlockedPromptException):
+        return "죄송합니다. 이 질문에 대한 응답을 생성할 수 없습니다. 다른 방식으로 질문을 표현해 보시겠습니까?"
+    if rate_limit.is_rate_limit_error(error):
+        return "현재 요청이 많아 답변을 생성할 수 없습니다. 잠시 후 다시 시도해주세요."
+    return f"응답 생성 중 오류 발생: {str(error)}"
 
-def process_multiple_transcripts(query, transcripts):
+
+def process_multiple_transcripts(query, transcripts, top_k=5):
     """여러 트랜스크립트에서 질문과 관련성 높은 부분 선별"""
     vectorizer = TfidfVectorizer()
     tfidf_matrix = vectorizer.fit_transform(transcripts + [query])
 
     cosine_similarities = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1]).flatten()
-    related_docs_indices = cosine_similarities.argsort()[:-6:-1]  # 상위 5개 관련 문서 선택
+    related_docs_indices = cosine_similarities.argsort()[:-(top_k + 1):-1]  # 상위 top_k개 관련 문서 선택
 
     relevant_parts = [transcripts[i] for i in related_docs_indices]
     return relevant_parts
+
+
+def _generate_with_gemini(prompt):
+    model = genai.GenerativeModel(model_name=GEMINI_MODEL)
+    response = rate_limit.limited_call(
+        "gemini", GEMINI_MODEL, lambda: model.generate_content(prompt),
+        tokens=rate_limit.estimate_tokens(prompt)
+    )
+    return response.text
+
+
+def _generate_with_openai(prompt):
+    response = rate_limit.limited_call(
+        "openai", OPENAI_CHAT_MODEL,
+        lambda: openai_client.chat.completions.create(
+            model=OPENAI_CHAT_MODEL,
+            messages=[{"role": "user", "content": prompt}]
+        ),
+        tokens=rate_limit.estimate_tokens(prompt)
+    )
+    return response.choices[0].message.content
+
+
+GENERATORS = {
+    "gemini": _generate_with_gemini,
+    "openai": _generate_with_openai,
+}
+
+
+def _timed_generation(provider, prompt):
+    """공급자별 지연 시간을 히스토그램에 기록하며 생성합니다."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        return GENERATORS[provider](prompt)
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        metrics.observe("llm_latency_seconds", time.perf_counter() - start, provider=provider, outcome=outcome)
+
+
+def generate_text(prompt, providers=None, hedge_delay=HEDGE_DELAY_SECONDS, interactive=True):
+    """
+    주 모델로 답변을 생성하고, hedge_delay초 안에 끝나지 않으면 다음 모델에도 같은 요청을 보내
+    먼저 도착한 답변을 사용합니다. 오류가 나면 즉시 다음 모델로 넘어갑니다.
+    모든 모델이 실패하면 첫 번째 모델의 예외를 그대로 발생시킵니다.
+    헤지/페일오버 요청은 별도 풀에서 실행하며, 백그라운드 작업(interactive=False)은 이 풀을 쓰지 않습니다.
+    """
+    providers = list(providers or GENERATION_PROVIDERS)
+    pending = {}
+    errors = {}
+
+    def launch(executor):
+        provider = providers.pop(0)
+        ctx = contextvars.copy_context()
+        pending[executor.submit(ctx.run, _timed_generation, provider, prompt)] = provider
+        return provider
+
+    backup_executor = _hedge_executor if interactive else _generation_executor
+    primary = launch(_generation_executor)
+    while pending:
+        can_hedge = providers and hedge_delay >= 0
+        done, _ = wait(pending, timeout=hedge_delay if can_hedge else None, return_when=FIRST_COMPLETED)
+        if not done:
+            hedged = launch(backup_executor)
+            metrics.inc_counter("llm_hedged", provider=hedged)
+            logger.info(f"{primary} 응답이 {hedge_delay}초를 넘어 {hedged}(으)로 헤지 요청을 보냅니다.")
+            continue
+
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                text = future.result()
+            except Exception as e:
+                errors[provider] = e
+                logger.warning(f"{provider} 답변 생성 실패: {str(e)}")
+                if providers and not pending:
+                    failover = launch(backup_executor)
+                    metrics.inc_counter("llm_failover", provider=failover)
+                continue
+            metrics.inc_counter("llm_wins", provider=provider)
+            return text
+
+    raise errors[primary]
+
+
+def summarize_transcript(transcript, title=""):
+    """
+    트랜스크립트의 요약과 핵심 포인트 목록을 생성합니다.
+    실패하면 (None, [])를 반환하며, 수집 파이프라인은 요약 없이 계속 진행합니다.
+    """
+    prompt = textwrap.dedent(f"""
+    다음은 YouTube 영상 "{title}"의 전체 내용입니다:
+
+    {transcript}
+
+    이 영상의 내용을 아래 JSON 형식으로만 정리해주세요. 다른 설명은 쓰지 마세요.
+    {{"summary": "영상 전체 내용을 5문장 이내로 요약", "key_points": ["핵심 포인트 1", "핵심 포인트 2", "..."]}}
+    핵심 포인트는 최대 10개까지, 각각 한 문장으로 작성하세요.
+    """)
+
+    try:
+        # 요약은 사용자가 기다리는 응답이 아니므로 헤지하지 않고, 오류 시에만 주 요청 풀에서 페일오버
+        text = generate_text(prompt, hedge_delay=-1, interactive=False)
+        match = re.search(r'\{.*\}', text, re.DOTALL)
+        data = json.loads(match.group(0) if match else text)
+        return data.get("summary") or None, [str(point) for point in data.get("key_points", [])]
+    except Exception as e:
+        logger.warning(f"영상 요약 생성 실패: {str(e)}")
+        return None, []
+
+
+# 코퍼스 전체를 메모리에 올리지 않고 문서를 하나씩 점수화하기 위한 상태 없는 벡터라이저
+_streaming_vectorizer = HashingVectorizer(n_features=2 ** 18, alternate_sign=False, norm='l2')
+
+
+def relevance_scores(query_vector, texts):
+    """질문 벡터와 각 텍스트의 코사인 유사도를 계산합니다."""
+    if not texts:
+        return []
+    return (_streaming_vectorizer.transform(texts) @ query_vector.T).toarray().ravel().tolist()
+
+
+def _push_top_k(heap, k, score, seq, item):
+    """크기가 k인 최소 힙에 점수가 높은 항목만 유지합니다."""
+    if len(heap) < k:
+        heapq.heappush(heap, (score, seq, item))
+    elif score > heap[0][0]:
+        heapq.heapreplace(heap, (score, seq, item))
+
+
+def video_digest(video):
+    """영상 선별에 사용할 짧은 텍스트. 요약이 없는 이전 데이터는 트랜스크립트 앞부분을 사용합니다."""
+    if video.get('summary'):
+        return " ".join([video.get('title', ''), video['summary']] + video.get('key_points', []))
+    return f"{video.get('title', '')} {video.get('transcript_head') or video.get('transcript', '')[:2000]}"
+
+
+def select_relevant_videos(query_vector, videos, top_n=MAP_REDUCE_TOP_VIDEOS):
+    """
+    영상 요약을 하나씩 읽으며 점수를 매기고 상위 top_n개만 유지합니다. (map 단계)
+    선택된 영상 목록과 전체 영상 수를 반환합니다.
+    """
+    heap = []
+    total = 0
+    for video in videos:
+        total += 1
+        score = relevance_scores(query_vector, [video_digest(video)])[0]
+        selected = {"video_id": video['video_id'], "title": video.get('title', 'Unknown'), "summary": video.get('summary')}
+        _push_top_k(heap, top_n, score, total, selected)
+    return [item for _, _, item in sorted(heap, reverse=True)], total
+
+
+def select_relevant_passages(query_vector, videos, top_k=MAP_REDUCE_TOP_PASSAGES):
+    """영상을 하나씩 읽어 문단 점수를 매기고 상위 top_k개 문단만 메모리에 유지합니다."""
+    heap = []
+    seq = 0
+    for video in videos:
+        passages = video_passages(video)
+        for passage, score in zip(passages, relevance_scores(query_vector, passages)):
+            seq += 1
+            _push_top_k(heap, top_k, score, seq, passage)
+    return [passage for _, _, passage in sorted(heap, reverse=True)]
+
+
+def fit_to_budget(parts, token_budget):
+    """순서대로 token_budget을 넘지 않는 만큼만 남깁니다."""
+    selected = []
+    used = 0
+    for part in parts:
+        tokens = rate_limit.estimate_tokens(part)
+        if used + tokens > token_budget:
+            continue
+        selected.append(part)
+        used += tokens
+    return selected, used
+
+
+def generate_map_reduce_response(query, videos, load_videos, token_budget=MAP_REDUCE_TOKEN_BUDGET):
+    """
+    많은 영상에 대한 질문을 요약 기반으로 답합니다.
+    1) 요약으로 관련 영상을 고르고, 2) 고른 영상의 문단 중 관련 높은 것만
+    token_budget 안에서 모아, 3) 영상 요약과 함께 한 번에 답변을 생성합니다.
+    videos는 요약 필드만 담은 문서의 이터러블(커서)이고, load_videos는 video_id 목록을 받아
+    트랜스크립트가 포함된 문서를 하나씩 내주는 함수입니다. 어느 단계에서도 상위 결과만 메모리에 유지합니다.
+    """
+    with metrics.span("retrieval"):
+        query_vector = _streaming_vectorizer.transform([query])
+        selected, total = select_relevant_videos(query_vector, videos)
+        overview = [
+            f"- {video['title']}: {video['summary']}"
+            for video in selected if video.get('summary')
+        ]
+        overview, used = fit_to_budget(overview, token_budget // 4)
+
+        ranked = select_relevant_passages(query_vector, load_videos([v['video_id'] for v in selected]))
+        passages, _ = fit_to_budget(ranked, token_budget - used)
+
+    overview_text = "\n".join(overview) or "(요약 없음)"
+    combined_passages = "\n\n".join(passages)
+    prompt = textwrap.dedent(f"""
+    다음은 질문과 관련된 {len(selected)}개 YouTube 영상의 요약입니다 (전체 {total}개 중 선별):
+
+    {overview_text}
+
+    다음은 해당 영상들에서 질문과 관련성이 높은 부분입니다:
+
+    {combined_passages}
+
+    질문: {query}
+
+    위의 내용을 바탕으로 질문에 답변해주세요. 답변 시 다음 지침을 따라주세요:
+    {ANSWER_GUIDELINES}
+
+    답변:
+    """)
+
+    try:
+        with metrics.span("llm_generation"):
+            return generate_text(prompt)
+    except Exception as e:
+        return describe_generation_error(e)
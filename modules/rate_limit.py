@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+import logging
+from config import API_RATE_LIMITS, DEFAULT_RATE_LIMIT, RATE_LIMIT_MAX_RETRIES
+from modules import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """분당 허용량을 기준으로 채워지는 토큰 버킷"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.fill_rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.fill_rate)
+        self.updated_at = now
+
+    def acquire(self, amount=1):
+        """토큰을 확보할 때까지 대기합니다. 한 번에 버킷 용량보다 많이 요청하면 용량만큼만 차감합니다."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.fill_rate
+            time.sleep(min(wait, 1.0))
+
+    def drain(self):
+        """429 응답을 받으면 남은 토큰을 비워 다른 호출도 잠시 쉬게 합니다."""
+        with self.lock:
+            self._refill()
+            self.tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """429가 발생하면 동시 호출 한도를 절반으로 줄이고, 성공할 때마다 천천히 회복합니다 (AIMD)."""
+
+    def __init__(self, max_limit):
+        self.max_limit = max(1, int(max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            self.waiting += 1
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.waiting -= 1
+            self.in_flight += 1
+
+    def release(self, succeeded=True, throttled=False):
+        """429면 한도를 줄이고, 성공한 경우에만 늘립니다. (다른 오류는 한도를 바꾸지 않음)"""
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            elif succeeded:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+            self.condition.notify_all()
+
+
+class ProviderLimiter:
+    """하나의 공급자/모델 조합에 대한 요청 수, 토큰 수, 동시성 제한"""
+
+    def __init__(self, key, rpm=None, tpm=None, max_concurrency=4):
+        self.key = key
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.bucket_waiting = 0
+        self.bucket_lock = threading.Lock()
+
+    def _publish(self):
+        # 대기열: 요청/토큰 버킷을 기다리는 호출 + 동시성 슬롯을 기다리는 호출
+        metrics.set_gauge("api_queue_depth", self.bucket_waiting + self.concurrency.waiting, limiter=self.key)
+        metrics.set_gauge("api_bucket_waiting", self.bucket_waiting, limiter=self.key)
+        metrics.set_gauge("api_in_flight", self.concurrency.in_flight, limiter=self.key)
+        metrics.set_gauge("api_concurrency_limit", round(self.concurrency.limit, 2), limiter=self.key)
+
+    def call(self, fn, tokens=0, max_retries=RATE_LIMIT_MAX_RETRIES):
+        """한도를 지키며 fn을 호출하고, 429 응답이면 지수 백오프 후 재시도합니다."""
+        for attempt in range(max_retries + 1):
+            # 버킷은 슬롯을 잡기 전에 기다려서, RPM/TPM 대기가 동시 호출 수를 차지하지 않게 함
+            self._acquire_buckets(tokens)
+            self.concurrency.acquire()
+            self._publish()
+            succeeded = throttled = False
+            try:
+                result = fn()
+                succeeded = True
+                return result
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                if throttled:
+                    metrics.inc_counter("api_throttled", limiter=self.key)
+                if not throttled or attempt == max_retries:
+                    raise
+                if self.requests:
+                    self.requests.drain()
+                delay = _retry_after(e) or min(60.0, (2 ** attempt) + random.uniform(0, 1))
+                logger.warning(f"{self.key} 호출 한도 초과 (429). {delay:.1f}초 후 재시도합니다. ({attempt + 1}/{max_retries})")
+            finally:
+                self.concurrency.release(succeeded=succeeded, throttled=throttled)
+                self._publish()
+            time.sleep(delay)
+
+    def _acquire_buckets(self, tokens):
+        with self.bucket_lock:
+            self.bucket_waiting += 1
+        self._publish()
+        try:
+            if self.requests:
+                self.requests.acquire(1)
+            if self.tokens and tokens:
+                self.tokens.acquire(tokens)
+        finally:
+            with self.bucket_lock:
+                self.bucket_waiting -= 1
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider, model):
+    """공급자/모델별로 프로세스 전체에서 공유되는 제한기를 반환합니다."""
+    key = f"{provider}:{model}"
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = ProviderLimiter(key, **API_RATE_LIMITS.get(key, DEFAULT_RATE_LIMIT))
+            _limiters[key] = limiter
+        return limiter
+
+
+def limited_call(provider, model, fn, tokens=0):
+    """공유 제한기를 거쳐 API를 호출합니다."""
+    return get_limiter(provider, model).call(fn, tokens=tokens)
+
+
+def estimate_tokens(text):
+    """토큰 수를 대략적으로 추정합니다. (한국어 기준 약 2자당 1토큰)"""
+    return len(text) // 2 + 1 if text else 0
+
+
+def is_rate_limit_error(error):
+    """OpenAI RateLimitError, Gemini ResourceExhausted 등 429 응답인지 확인합니다."""
+    if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+        return True
+    return type(error).__name__ in ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
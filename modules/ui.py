@@ -1,5 +1,7 @@
 import streamlit as st
-from modules import auth, video_processing, database, nlp
+import streamlit.components.v1 as components
+from modules import auth, video_processing, database, nlp, metrics, chat
+from config import ADMIN_USERNAMES, SESSION_COOKIE_NAME, SESSION_TOKEN_TTL_SECONDS
 import time
 import logging
 import os
@@ -67,8 +69,10 @@ def show_sidebar():
         show_logo()  # 사이드바에 로고 표시
         st.write(f"환영합니다, {st.session_state.user['username']}님!")
         if st.button("로그아웃"):
+            auth.revoke_sessions(st.session_state.user['_id'])
             st.session_state.user = None
             st.session_state.page = 'login'
+            st.session_state.session_cookie = ""  # 다음 실행에서 쿠키 삭제
             st.rerun()
 
         st.write("---")
@@ -78,6 +82,33 @@ def show_sidebar():
             st.session_state.page = 'ask_question'
         if st.button("처리된 영상 목록보기"):
             st.session_state.page = 'view_videos'
+        if is_admin(st.session_state.user):
+            st.write("---")
+            if st.button("성능 지표"):
+                st.session_state.page = 'metrics'
+
+
+def sync_session_cookie():
+    """
+    로그인/로그아웃 시 예약된 세션 쿠키 변경을 브라우저에 반영합니다.
+    토큰은 주소창/기록/프록시 로그에 남지 않도록 URL이 아닌 쿠키에 저장합니다.
+    (st.rerun 직전에 그린 요소는 전송되지 않으므로 다음 실행에서 처리)
+    """
+    token = st.session_state.pop('session_cookie', None)
+    if token is None:
+        return
+    max_age = SESSION_TOKEN_TTL_SECONDS if token else 0
+    components.html(
+        f"""<script>
+        const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+        window.parent.document.cookie = "{SESSION_COOKIE_NAME}={token}; Max-Age={max_age}; Path=/; SameSite=Strict" + secure;
+        </script>""",
+        height=0,
+    )
+
+
+def is_admin(user):
+    return bool(user) and user.get('username') in ADMIN_USERNAMES
 
 def show_login_form():
     st.markdown(
@@ -108,6 +139,9 @@ def show_login_form():
                 st.success("로그인 성공!")
                 st.session_state.user = user
                 st.session_state.page = 'process_video'
+                token = auth.create_session_token(user)
+                if token:
+                    st.session_state.session_cookie = token  # 다음 실행에서 쿠키 저장
                 st.rerun()
             else:
                 st.error("로그인 실패. 사용자명과 비밀번호를 확인하세요.")
@@ -127,7 +161,7 @@ def show_video_processing_form():
     st.header("새 YouTube 영상 처리")
     st.warning(f"주의: 현재 {video_processing.MAX_VIDEO_DURATION // 60}분 이하의 영상만 처리 가능합니다.")
 
-    video_url = st.text_input("YouTube 영상 URL 입력")
+    video_url = st.text_input("YouTube 영상 URL 입력", key="video_url_input", on_change=prefetch_video_callback)
     if st.button("영상 처리", key="process_video_button"):
         if not video_url:
             st.error("YouTube 영상 URL을 입력해주세요.")
@@ -135,60 +169,126 @@ def show_video_processing_form():
 
         try:
             user_id = st.session_state.user['_id']
-            with st.spinner("영상 정보 가져오는 중... ⏳"):
-                title, channel, duration = video_processing.get_video_info(video_url)
-                estimated_time = (duration // 600) * 60 + (duration % 600) // 10  # 10분당 60초 기준 계산
-                st.info(f"**{title}** ({channel}) - 예상 처리 시간: 약 {estimated_time}초 ⏰")
-
-            # 기존에 처리된 영상인지 확인
-            _, video_id = video_processing.extract_video_id_and_process(video_url)
-            existing_video = video_processing.get_existing_video(video_id)
-
-            if existing_video:
-                st.info(f"이 영상는 이미 처리되었습니다. 기존 데이터를 사용합니다.")
-                video_processing.update_user_for_video(existing_video['_id'], user_id)
-                video_id = existing_video['_id']
-            else:
-                progress_bar = st.progress(0, text="영상 처리 중... 🏃")
-                start_time = time.time()
+            # 메타데이터 조회부터 처리까지를 하나의 수집 요청으로 기록 (process_video는 이 요청을 이어서 사용)
+            with metrics.request("ingest", user_id=user_id):
+                with st.spinner("영상 정보 가져오는 중... ⏳"):
+                    _, video_id = video_processing.extract_video_id_and_process(video_url)
+                    metrics.bind(video_id=video_id)
+                    # URL 입력 시 시작된 미리 가져오기가 진행 중이면 기다림 (대기열에만 있으면 취소하고 직접 가져옴)
+                    video_processing.wait_for_prefetch(video_id)
+                    with metrics.span("metadata_fetch"):
+                        title, channel, duration = video_processing.get_video_info(video_url)
+                    estimated_time = (duration // 600) * 60 + (duration % 600) // 10  # 10분당 60초 기준 계산
+                    st.info(f"**{title}** ({channel}) - 예상 처리 시간: 약 {estimated_time}초 ⏰")
+
+                # 기존에 처리된 영상인지 확인
+                existing_video = video_processing.get_existing_video(video_id)
+
+                if existing_video:
+                    st.info(f"이 영상는 이미 처리되었습니다. 기존 데이터를 사용합니다.")
+                    video_processing.update_user_for_video(existing_video['video_id'], user_id)
+                    video_id = existing_video['_id']
+                else:
+                    try:
+                        video_id = run_video_processing(video_url, user_id)
+                    except video_processing.NearDuplicateFound as e:
+                        # 기존 영상 사용 여부는 아래 선택 버튼으로 받음
+                        st.session_state.near_duplicate = {
+                            "video_url": video_url,
+                            "video_id": e.video_id,
+                            "candidates": e.candidates,
+                        }
+                        video_id = None
+
+            if video_id:
+                update_processed_videos(user_id)
+                show_processing_guide()
 
-                video_id = video_processing.process_video(video_url, user_id, progress_bar)
+        except Exception as e:
+            st.error(f"영상 처리 중 오류 발생: {str(e)}")
 
-                end_time = time.time()
-                elapsed_time = end_time - start_time
-                st.success(f"영상 처리 완료! 🎉  ({video_processing.format_time(elapsed_time)} 소요)")
+    if st.session_state.get('near_duplicate'):
+        show_near_duplicate_choice()
 
-            update_processed_videos(user_id)
 
-            # 여기서 버튼 대신 안내 메시지 표시
-            st.markdown(
-                '<p style="font-size: 14px; color: #31333F; background-color: #F0F2F6; padding: 10px; border-radius: 5px; margin-bottom: 10px;">'
-                'ℹ️ 처리된 영상을 확인하려면 메뉴의 <strong>[처리된 영상 목록보기]</strong> 선택'
-                '</p>',
-                unsafe_allow_html=True
-            )
-
-            st.markdown(
-                '<p style="font-size: 14px; color: #31333F; background-color: #F0F2F6; padding: 10px; border-radius: 5px;">'
-                'ℹ️ 영상에 대해 질문하려면 메뉴의 <strong>[질문하기]</strong> 를 선택'
-                '</p>',
-                unsafe_allow_html=True
-            )
-
-            # # 처리 완료 후 버튼 표시
-            # col1, col2 = st.columns(2)
-            # with col1:
-            #     if st.button("질문하기", key="ask_question_button"):
-            #         st.session_state.next_page = "ask_question"
-            #         st.session_state.current_selected_video_id = video_id
-            # with col2:
-            #     if st.button("영상 목록 보기", key="view_videos_button"):
-            #         st.session_state.next_page = "view_videos"
+def run_video_processing(video_url, user_id, check_near_duplicates=True):
+    """진행 표시줄과 함께 영상을 처리하고 소요 시간을 표시합니다."""
+    progress_bar = st.progress(0, text="영상 처리 중... 🏃")
+    start_time = time.time()
+
+    video_id = video_processing.process_video(video_url, user_id, progress_bar, check_near_duplicates)
+
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    st.success(f"영상 처리 완료! 🎉  ({video_processing.format_time(elapsed_time)} 소요)")
+    return video_id
 
+
+def show_near_duplicate_choice():
+    """유사한 기존 영상을 사용할지, 그래도 새로 처리할지 선택합니다."""
+    near_duplicate = st.session_state.near_duplicate
+    user_id = st.session_state.user['_id']
+
+    st.warning("이미 처리된 영상 중 거의 같은 영상이 있습니다. 기존 영상을 사용하면 처리 시간과 API 비용을 아낄 수 있습니다.")
+    for candidate in near_duplicate["candidates"]:
+        basis = "자막 내용" if candidate["match"] == "content" else "제목과 길이"
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.write(f"**{candidate['title']}** ({candidate['channel']}) - {basis} 유사도 {candidate['similarity']:.0%}")
+        with col2:
+            if st.button("이 영상 사용", key=f"use_duplicate_{candidate['video_id']}"):
+                video_processing.link_to_existing_video(near_duplicate["video_id"], candidate["video_id"], user_id)
+                st.session_state.near_duplicate = None
+                update_processed_videos(user_id)
+                st.success("기존 영상을 목록에 추가했습니다. 🎉")
+                show_processing_guide()
+                return
+
+    if st.button("그래도 새로 처리", key="process_duplicate_anyway"):
+        st.session_state.near_duplicate = None
+        try:
+            run_video_processing(near_duplicate["video_url"], user_id, check_near_duplicates=False)
+            update_processed_videos(user_id)
+            show_processing_guide()
         except Exception as e:
             st.error(f"영상 처리 중 오류 발생: {str(e)}")
 
 
+def show_processing_guide():
+    """처리 완료 후 다음 단계를 안내합니다."""
+    # 여기서 버튼 대신 안내 메시지 표시
+    st.markdown(
+        '<p style="font-size: 14px; color: #31333F; background-color: #F0F2F6; padding: 10px; border-radius: 5px; margin-bottom: 10px;">'
+        'ℹ️ 처리된 영상을 확인하려면 메뉴의 <strong>[처리된 영상 목록보기]</strong> 선택'
+        '</p>',
+        unsafe_allow_html=True
+    )
+
+    st.markdown(
+        '<p style="font-size: 14px; color: #31333F; background-color: #F0F2F6; padding: 10px; border-radius: 5px;">'
+        'ℹ️ 영상에 대해 질문하려면 메뉴의 <strong>[질문하기]</strong> 를 선택'
+        '</p>',
+        unsafe_allow_html=True
+    )
+
+    # # 처리 완료 후 버튼 표시
+    # col1, col2 = st.columns(2)
+    # with col1:
+    #     if st.button("질문하기", key="ask_question_button"):
+    #         st.session_state.next_page = "ask_question"
+    #         st.session_state.current_selected_video_id = video_id
+    # with col2:
+    #     if st.button("영상 목록 보기", key="view_videos_button"):
+    #         st.session_state.next_page = "view_videos"
+
+
+def prefetch_video_callback():
+    """URL이 입력되는 즉시 백그라운드에서 영상 정보와 자막을 미리 가져옵니다."""
+    video_url = st.session_state.get('video_url_input')
+    if video_url:
+        video_processing.prefetch_video(video_url)
+
+
 def show_question_form():
     st.header("영상에 대해 질문하기")
     user_id = st.session_state.user['_id']
@@ -214,12 +314,14 @@ def show_individual_video_question(user_id):
             if question:
                 with st.spinner("답변 생성 중..."):
                     try:
-                        video_data = database.get_video_info_from_db([selected_video_id])
-                        if video_data and 'transcript' in video_data[0]:
-                            response = nlp.generate_response(question, [video_data[0]['transcript']])
-                            display_response(question, response)
-                        else:
-                            st.error("선택한 영상의 트랜스크립트를 찾을 수 없습니다.")
+                        with metrics.request("answer", user_id=user_id, video_id=selected_video_id):
+                            video_data = database.get_video_info_from_db([selected_video_id])
+                            if video_data and 'transcript' in video_data[0]:
+                                response = nlp.generate_response(question, nlp.video_passages(video_data[0]),
+                                                                 top_k=nlp.PASSAGE_TOP_K)
+                                display_response(question, response)
+                            else:
+                                st.error("선택한 영상의 트랜스크립트를 찾을 수 없습니다.")
                     except Exception as e:
                         st.error(f"답변 생성 중 오류가 발생했습니다: {str(e)}")
             else:
@@ -229,11 +331,13 @@ def show_individual_video_question(user_id):
 
 
 def show_tag_based_question(user_id):
-    all_tags = database.get_all_tags()
+    all_tags = database.get_all_tags(user_id)
     selected_tags = st.multiselect("태그 선택", all_tags, key="tag_selector")
 
     if selected_tags:
-        videos = select_videos_by_tags(selected_tags)
+        # 태그에 해당하는 영상 ID는 한 번만 조회하고 목록 표시와 답변 생성에 함께 사용
+        video_ids = database.get_user_video_ids_by_tags(user_id, selected_tags)
+        videos = database.get_videos_by_ids(video_ids)
         if videos:
             st.write(f"선택된 영상 수: {len(videos)}")
             video_titles = [f"{v['title']} - {v['channel']}" for v in videos]
@@ -244,13 +348,13 @@ def show_tag_based_question(user_id):
                 if question:
                     with st.spinner("답변 생성 중..."):
                         try:
-                            video_data = database.get_video_info_from_db([v['video_id'] for v in videos])
-                            if video_data:
-                                transcripts = [v['transcript'] for v in video_data if 'transcript' in v]
-                                response = nlp.generate_response(question, transcripts)
-                                display_response(question, response)
-                            else:
-                                st.error("선택한 영상의 트랜스크립트를 찾을 수 없습니다.")
+                            with metrics.request("answer", user_id=user_id):
+                                response = nlp.generate_map_reduce_response(
+                                    question,
+                                    database.iter_video_digests(video_ids),
+                                    database.iter_video_transcripts
+                                )
+                            display_response(question, response)
                         except Exception as e:
                             st.error(f"답변 생성 중 오류가 발생했습니다: {str(e)}")
                 else:
@@ -267,10 +371,6 @@ def display_response(question, response):
     st.divider()
     st.markdown("### 답변:")
     st.write(response)
-def select_videos_by_tags(tags):
-    return database.get_videos_by_tags(tags)
-
-
 def show_processed_videos():
     st.header("처리된 영상목록", divider=True)
     user_id = st.session_state.user['_id']
@@ -284,9 +384,10 @@ def show_processed_videos():
     st.subheader("필터 옵션")
     col1, col2, col3 = st.columns(3)
     with col1:
-        all_tags = database.get_all_tags()
-        logger.info(f"All tags: {all_tags}")
-        selected_tags = st.multiselect("태그 선택", all_tags)
+        tag_counts = database.get_tag_counts(user_id)
+        logger.info(f"All tags: {tag_counts}")
+        selected_tags = st.multiselect("태그 선택", list(tag_counts),
+                                       format_func=lambda tag: f"{tag} ({tag_counts[tag]})")
     with col2:
         today = datetime.now().date()
         date_range = st.date_input("기간 선택", [today, today])
@@ -318,6 +419,8 @@ def show_processed_videos():
     logger.info(f"Number of videos retrieved: {len(valid_videos)}")
 
     if valid_videos:
+        show_bulk_tag_editor(user_id, valid_videos)
+
         for video in valid_videos:
             with st.container():
                 # 영상 제목 (카드 형태)
@@ -327,7 +430,7 @@ def show_processed_videos():
 
                 # 메타데이터 (일렬 배치)
                 st.markdown(f"""
-                채널명: {video.get('channel', 'Unknown')} | 처리 일자: {video.get('processed_at', datetime.now()).strftime('%Y-%m-%d %H:%M')} | 길이: {video_processing.format_time(video.get('duration', 0))} | 처리된 글자수: {video.get('transcript_length', 0)} 자
+                채널명: {video.get('channel', 'Unknown')} | 추가 일자: {(video.get('added_at') or video.get('processed_at') or datetime.now()).strftime('%Y-%m-%d %H:%M')} | 길이: {video_processing.format_time(video.get('duration', 0))} | 처리된 글자수: {video.get('transcript_length', 0)} 자
                 """, unsafe_allow_html=True)
                 st.divider()
 
@@ -341,7 +444,7 @@ def show_processed_videos():
                             st.write(tag)
                         with col2:
                             if st.button("삭제", key=f"delete_{video['video_id']}_{tag}"):
-                                if delete_tag(video['video_id'], tag):
+                                if delete_tag(user_id, video['video_id'], tag):
                                     st.success(f"태그 '{tag}'가 삭제되었습니다.")
                                     time.sleep(1)  # 사용자가 메시지를 볼 수 있도록 잠시 대기
                                     st.rerun()  # 페이지 새로고침
@@ -359,7 +462,7 @@ def show_processed_videos():
                 with col2:
                     if st.button("태그 추가", key=f"add_tag_{video['video_id']}"):
                         if new_tag:
-                            if database.add_tag_to_video(video['video_id'], new_tag):
+                            if database.add_tag_to_video(user_id, video['video_id'], new_tag):
                                 st.success("태그가 추가되었습니다.")
                                 # 입력 필드 키 변경
                                 st.session_state['tag_input_key'] = st.session_state.get('tag_input_key', 0) + 1
@@ -383,6 +486,8 @@ def show_processed_videos():
                     if st.button("전문보기", key=f"full_{video['video_id']}"):
                         st.session_state.page = 'full_transcript'
                         st.session_state.selected_video_id = video['video_id']
+                        st.session_state.transcript_page = 0
+                        st.session_state.transcript_seek = 0
                         st.rerun()
 
             st.markdown("---")  # 영상 사이에 구분선 추가
@@ -392,29 +497,74 @@ def show_processed_videos():
         st.info("선택한 조건에 맞는 영상이 없습니다.")
 
 
+# 사용자 세션당 유지할 영상 채팅 수
+MAX_CHAT_SESSIONS = 5
+
+
+def get_chat_session(video_id):
+    """영상별 채팅 세션을 재사용하고, 처음 열 때만 DB에서 영상을 불러옵니다."""
+    sessions = st.session_state.setdefault('chat_sessions', {})
+    if video_id not in sessions:
+        video_data = database.get_video_info_from_db([video_id])
+        if not video_data:
+            return None
+        sessions[video_id] = chat.ChatSession(video_data[0])
+        while len(sessions) > MAX_CHAT_SESSIONS:
+            sessions.pop(next(iter(sessions)))
+    return sessions[video_id]
+
+
+def show_bulk_tag_editor(user_id, videos):
+    """여러 영상에 한 번에 태그를 추가하거나 제거합니다."""
+    with st.expander("여러 영상 태그 편집"):
+        video_options = {f"{v.get('title', 'Unknown')} - {v.get('channel', 'Unknown')}": v['video_id'] for v in videos}
+        selected = st.multiselect("영상 선택", list(video_options), key="bulk_tag_videos")
+        tag = st.text_input("태그", key=f"bulk_tag_input_{st.session_state.get('tag_input_key', 0)}")
+        col1, col2 = st.columns(2)
+        with col1:
+            add_clicked = st.button("선택한 영상에 태그 추가", key="bulk_add_tag")
+        with col2:
+            remove_clicked = st.button("선택한 영상에서 태그 제거", key="bulk_remove_tag")
+
+        if add_clicked or remove_clicked:
+            if not selected or not tag:
+                st.warning("영상과 태그를 모두 선택/입력해주세요.")
+                return
+            video_ids = [video_options[title] for title in selected]
+            if add_clicked:
+                changed = database.bulk_update_tags(user_id, video_ids, add_tags=[tag])
+            else:
+                changed = database.bulk_update_tags(user_id, video_ids, remove_tags=[tag])
+            st.success(f"{changed}개 영상의 태그가 변경되었습니다.")
+            st.session_state['tag_input_key'] = st.session_state.get('tag_input_key', 0) + 1
+            time.sleep(1)
+            st.rerun()
+
+
 def show_chat_page():
     st.header("영상 채팅")
     if st.session_state.selected_video_id:
-        # selected_video_id를 리스트로 감싸서 전달
-        video_data = database.get_video_info_from_db([st.session_state.selected_video_id])
-        if video_data and len(video_data) > 0:
-            video = video_data[0]  # 첫 번째 (유일한) 결과를 사용
-            st.subheader(f"영상: {video.get('title', 'Unknown')}")
+        session = get_chat_session(st.session_state.selected_video_id)
+        if session:
+            st.subheader(f"영상: {session.title}")
 
-            question = st.text_input("질문을 입력하세요")
-            if st.button("답변 받기"):
-                if question:
-                    with st.spinner("답변 생성 중..."):
-                        try:
-                            response = nlp.generate_response(question, [video.get('transcript', '')])
-                            st.markdown("### 질문:")
-                            st.write(question)
-                            st.markdown("### 답변:")
-                            st.write(response)
-                        except Exception as e:
-                            st.error(f"답변 생성 중 오류가 발생했습니다: {str(e)}")
-                else:
-                    st.warning("질문을 입력해주세요.")
+            for message in session.history:
+                with st.chat_message(message["role"]):
+                    st.write(message["content"])
+
+            question = st.chat_input("질문을 입력하세요")
+            if question:
+                with st.chat_message("user"):
+                    st.write(question)
+                with st.spinner("답변 생성 중..."):
+                    with metrics.request("answer", user_id=st.session_state.user['_id'], video_id=session.video_id):
+                        response = session.ask(question)
+                with st.chat_message("assistant"):
+                    st.write(response)
+
+            if session.history and st.button("대화 초기화"):
+                session.reset()
+                st.rerun()
         else:
             st.error("선택한 영상의 정보를 찾을 수 없습니다.")
     else:
@@ -426,11 +576,10 @@ def show_chat_page():
         st.rerun()
 
 
-def delete_tag(video_id, tag):
+def delete_tag(user_id, video_id, tag):
     """태그 삭제 함수"""
     try:
-        database.remove_tag_from_video(video_id, tag)
-        return True
+        return database.remove_tag_from_video(user_id, video_id, tag)
     except Exception as e:
         logger.error(f"태그 삭제 중 오류 발생: {str(e)}")
         return False
@@ -439,17 +588,26 @@ def get_valid_videos(user_id):
     all_videos = database.get_user_videos(user_id)
     return [video for video in all_videos if video.get('title') and video.get('channel')]
 
+# 전문보기 화면에서 한 번에 불러올 구간 수
+SEGMENTS_PER_PAGE = 50
+
+
 def show_full_transcript():
     st.header("영상 전체 내용보기")
     if st.session_state.selected_video_id:
-        # selected_video_id를 리스트로 감싸서 전달
-        video_data = database.get_video_info_from_db([st.session_state.selected_video_id])
-        if video_data and len(video_data) > 0:
-            video = video_data[0]  # 첫 번째 (유일한) 결과를 사용
+        video_id = st.session_state.selected_video_id
+        page = st.session_state.get('transcript_page', 0)
+        video = database.get_video_segments(video_id, skip=page * SEGMENTS_PER_PAGE, limit=SEGMENTS_PER_PAGE)
+        if video:
             st.markdown(f'<span style="font-size: 24px;">**{video.get("title", "Unknown")}**</span>', unsafe_allow_html=True)
             st.write(f"채널명: {video.get('channel', 'Unknown')}")
-            st.write("전문:")
-            st.text_area("", value=video.get('transcript', ''), height=400, disabled=True)
+            if video.get('segments'):
+                show_transcript_segments(video, page)
+            else:
+                # 구간 정보가 없는 이전 데이터는 전체 텍스트로 표시
+                video_data = database.get_video_info_from_db([video_id])
+                st.write("전문:")
+                st.text_area("", value=video_data[0].get('transcript', '') if video_data else '', height=400, disabled=True)
         else:
             st.error("선택한 영상의 정보를 찾을 수 없습니다.")
     else:
@@ -458,8 +616,37 @@ def show_full_transcript():
     if st.button("영상 목록으로 돌아가기"):
         st.session_state.page = "view_videos"
         st.session_state.selected_video_id = None
+        st.session_state.transcript_page = 0
+        st.session_state.transcript_seek = 0
         st.rerun()
 
+
+def show_transcript_segments(video, page):
+    """현재 페이지의 구간만 표시하고, 시간을 누르면 영상의 해당 장면으로 이동합니다."""
+    st.video(f"https://www.youtube.com/watch?v={video['video_id']}",
+             start_time=int(st.session_state.get('transcript_seek', 0)))
+
+    total_pages = max(1, -(-video.get('segment_count', 0) // SEGMENTS_PER_PAGE))
+    st.write(f"전문: ({page + 1} / {total_pages} 페이지)")
+    for index, segment in enumerate(video['segments']):
+        col1, col2 = st.columns([1, 8])
+        with col1:
+            if st.button(nlp.format_timestamp(segment['start']), key=f"seek_{page}_{index}"):
+                st.session_state.transcript_seek = segment['start']
+                st.rerun()
+        with col2:
+            st.write(segment['text'])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if page > 0 and st.button("이전 페이지"):
+            st.session_state.transcript_page = page - 1
+            st.rerun()
+    with col2:
+        if page + 1 < total_pages and st.button("다음 페이지"):
+            st.session_state.transcript_page = page + 1
+            st.rerun()
+
 def update_processed_videos(user_id):
     st.session_state.processed_videos = database.get_user_videos(user_id)
 
@@ -474,9 +661,9 @@ def show_feedback_form():
         else:
             st.warning("피드백 내용을 입력해주세요.")
 
-def add_tag_callback(video_id, new_tag):
+def add_tag_callback(user_id, video_id, new_tag):
     if new_tag:
-        if database.add_tag_to_video(video_id, new_tag):
+        if database.add_tag_to_video(user_id, video_id, new_tag):
             st.success("태그가 추가되었습니다.")
             # 입력 필드 초기화
             st.session_state[f"new_tag_{video_id}"] = ""
@@ -486,3 +673,43 @@ def add_tag_callback(video_id, new_tag):
             st.warning("태그를 추가할 수 없습니다. (최대 3개)")
     else:
         st.warning("태그를 입력해주세요.")
+
+
+def show_metrics_page():
+    st.header("성능 지표")
+    if not is_admin(st.session_state.user):
+        st.error("관리자만 접근할 수 있습니다.")
+        return
+
+    summary = metrics.summarize_spans()
+    if not summary:
+        st.info("아직 기록된 지표가 없습니다.")
+        return
+
+    st.subheader("단계별 소요 시간 (초)")
+    st.dataframe([
+        {key: round(value, 3) if isinstance(value, float) else value for key, value in row.items()}
+        for row in summary
+    ], use_container_width=True)
+
+    st.subheader("최근 요청")
+    st.dataframe(metrics.summarize_requests(), use_container_width=True)
+
+    histograms = metrics.summarize_histograms()
+    if histograms:
+        st.subheader("지연 시간 및 배치 크기 분포 (구간 상한 기준 근사값)")
+        st.dataframe([
+            {key: round(value, 3) if isinstance(value, float) else value for key, value in row.items()}
+            for row in histograms
+        ], use_container_width=True)
+
+    gauges = metrics.get_gauges()
+    if gauges:
+        st.subheader("API 호출 대기열")
+        st.dataframe([{"metric": name, **labels, "value": value} for name, labels, value in gauges],
+                     use_container_width=True)
+
+    st.subheader("텍스트 덤프")
+    metrics_text = metrics.render_text()
+    st.code(metrics_text, language="text")
+    st.download_button("지표 다운로드", metrics_text, file_name="askontube_metrics.txt", mime="text/plain")
@@ -7,9 +7,18 @@ import requests
 import isodate
 import yt_dlp
 import time
-from config import MAX_VIDEO_DURATION, YOUTUBE_API_KEY
-from modules.database import videos_collection
-from modules.nlp import transcribe_audio, embed_text
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import UpdateOne
+from config import (MAX_VIDEO_DURATION, YOUTUBE_API_KEY, NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_TITLE_THRESHOLD,
+                    VIDEO_METADATA_CACHE_SIZE, VIDEO_METADATA_CACHE_TTL_SECONDS,
+                    PREFETCH_WORKERS, PREFETCH_TTL_SECONDS, PREFETCH_WAIT_SECONDS)
+from modules.database import (videos_collection, add_video_for_user, find_fingerprint_candidates,
+                              add_video_alias, get_video_alias)
+from modules.fingerprint import compute_fingerprint, estimate_jaccard, estimate_containment
+from modules.nlp import embed_text, summarize_transcript
+from modules import metrics, rate_limit
+from modules.embedding import embed_many
+from modules.cache import TTLCache
 from openai import OpenAI
 import tiktoken
 from config import OPENAI_API_KEY
@@ -20,6 +29,18 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 세션 간에 공유되는 YouTube 메타데이터/자막 트랙 캐시 (video_id 기준)
+video_info_cache = TTLCache(VIDEO_METADATA_CACHE_SIZE, VIDEO_METADATA_CACHE_TTL_SECONDS)
+caption_track_cache = TTLCache(VIDEO_METADATA_CACHE_SIZE, VIDEO_METADATA_CACHE_TTL_SECONDS)
+
+# URL 입력 직후 미리 받아둔 자막 텍스트와 진행 중인 미리 가져오기 작업
+caption_text_cache = TTLCache(128, PREFETCH_TTL_SECONDS)
+_prefetches = TTLCache(256, PREFETCH_TTL_SECONDS)
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+
+# videos.list API가 한 번에 허용하는 최대 ID 수
+YOUTUBE_MAX_IDS_PER_REQUEST = 50
+
 def chunk_text(text, max_tokens=8000):
     """텍스트를 지정된 최대 토큰 수로 나눕니다."""
     enc = tiktoken.encoding_for_model("text-embedding-ada-002")
@@ -43,12 +64,11 @@ def chunk_text(text, max_tokens=8000):
 
 def embed_text(text):
     """텍스트를 청크로 나누고 각 청크를 임베딩합니다."""
-    chunks = chunk_text(text)
-    embeddings = []
+    with metrics.span("chunking"):
+        chunks = chunk_text(text)
 
-    for chunk in chunks:
-        response = client.embeddings.create(input=[chunk], model="text-embedding-ada-002")
-        embeddings.append(response.data[0].embedding)
+    with metrics.span("embedding"):
+        embeddings = embed_many(chunks)
 
     # 모든 청크의 임베딩 평균을 계산
     if embeddings:
@@ -57,15 +77,6 @@ def embed_text(text):
     else:
         return []
 
-def transcribe_audio(file_path):
-    """오디오 파일을 텍스트로 변환"""
-    with open(file_path, "rb") as audio_file:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file
-        )
-    return transcript.text
-
 def extract_video_id_and_process(url):
     """
     YouTube URL에서 비디오 ID를 추출하고 적절한 형식으로 처리합니다.
@@ -131,20 +142,9 @@ def get_video_info(video_url):
         base_url, video_id = extract_video_id_and_process(video_url)
         logger.info(f"API 요청을 위한 비디오 ID: {video_id}")
 
-        url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet,contentDetails&id={video_id}&key={YOUTUBE_API_KEY}"
-        logger.debug(f"YouTube API 요청 URL: {url}")
-
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-
-        if "items" in data and len(data["items"]) > 0:
-            video_data = data["items"][0]
-            title = video_data["snippet"]["title"]
-            channel = video_data["snippet"]["channelTitle"]
-            duration = parse_duration(video_data["contentDetails"]["duration"])
-            logger.info(f"비디오 정보 추출 성공 - 제목: {title}, 채널: {channel}, 길이: {duration}초")
-            return title, channel, duration
+        video_info = get_videos_info_bulk([video_id]).get(video_id)
+        if video_info:
+            return video_info
         else:
             raise ValueError(f"비디오를 찾을 수 없습니다. 비디오 ID: {video_id}")
 
@@ -158,44 +158,97 @@ def get_video_info(video_url):
         logger.error(f"예상치 못한 오류 발생: {e}")
         raise ValueError(f"비디오 정보를 처리하는 중 오류가 발생했습니다: {str(e)}")
 
+def get_videos_info_bulk(video_ids):
+    """
+    여러 비디오의 (제목, 채널, 길이)를 video_id 기준 dict로 반환합니다.
+    캐시에 없는 ID만 50개씩 묶어 YouTube API에 요청하고, 결과를 캐시에 채웁니다.
+    """
+    result = video_info_cache.get_many(video_ids)
+    missing = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in result]
+
+    for i in range(0, len(missing), YOUTUBE_MAX_IDS_PER_REQUEST):
+        batch = missing[i:i + YOUTUBE_MAX_IDS_PER_REQUEST]
+        url = f"https://www.googleapis.com/youtube/v3/videos?part=snippet,contentDetails&id={','.join(batch)}&key={YOUTUBE_API_KEY}"
+        logger.debug(f"YouTube API 요청 URL: {url}")
+
+        response = requests.get(url)
+        response.raise_for_status()
+        data = response.json()
+
+        for video_data in data.get("items", []):
+            title = video_data["snippet"]["title"]
+            channel = video_data["snippet"]["channelTitle"]
+            duration = parse_duration(video_data["contentDetails"]["duration"])
+            logger.info(f"비디오 정보 추출 성공 - 제목: {title}, 채널: {channel}, 길이: {duration}초")
+            result[video_data["id"]] = (title, channel, duration)
+            video_info_cache.set(video_data["id"], result[video_data["id"]])
+
+    return result
+
+
 def parse_duration(duration):
     """YouTube API의 duration 문자열을 초 단위로 변환합니다."""
     return int(isodate.parse_duration(duration).total_seconds())
 
 
-def get_video_captions(video_id):
-    """YouTube API를 사용하여 비디오의 자막을 가져옵니다."""
+def get_caption_track(video_id):
+    """
+    비디오에서 사용할 자막 트랙 ID를 반환합니다. (한국어 > 영어 > 첫 번째 자막 순)
+    자막이 없으면 빈 문자열을 반환하며, 두 경우 모두 캐시에 저장됩니다. 요청이 실패하면 None을 반환합니다.
+    """
+    cached = caption_track_cache.get(video_id)
+    if cached is not None:
+        return cached
+
     url = f"https://www.googleapis.com/youtube/v3/captions?part=snippet&videoId={video_id}&key={YOUTUBE_API_KEY}"
 
     try:
         response = requests.get(url)
         response.raise_for_status()
         data = response.json()
+    except requests.RequestException as e:
+        logger.error(f"자막 정보 요청 중 오류 발생: {str(e)}")
+        return None
 
-        if "items" in data and len(data["items"]) > 0:
-            ko_caption = next((item for item in data["items"] if item["snippet"]["language"] == "ko"), None)
-            en_caption = next((item for item in data["items"] if item["snippet"]["language"] == "en"), None)
+    caption_id = ""
+    if "items" in data and len(data["items"]) > 0:
+        ko_caption = next((item for item in data["items"] if item["snippet"]["language"] == "ko"), None)
+        en_caption = next((item for item in data["items"] if item["snippet"]["language"] == "en"), None)
 
-            caption_id = ko_caption["id"] if ko_caption else (
-                en_caption["id"] if en_caption else data["items"][0]["id"])
+        caption_id = ko_caption["id"] if ko_caption else (
+            en_caption["id"] if en_caption else data["items"][0]["id"])
 
-            return download_caption(caption_id)
-        else:
-            logger.info(f"비디오 {video_id}에 사용 가능한 자막이 없습니다.")
-            return None
+    caption_track_cache.set(video_id, caption_id)
+    return caption_id
 
-    except requests.RequestException as e:
-        logger.error(f"자막 정보 요청 중 오류 발생: {str(e)}")
-        return None
+
+def get_video_captions(video_id):
+    """YouTube API를 사용하여 비디오의 자막을 가져옵니다."""
+    caption_text = caption_text_cache.get(video_id)
+    if caption_text:
+        return caption_text
+
+    caption_id = get_caption_track(video_id)
+    if caption_id:
+        caption_text = download_caption(caption_id)
+        if caption_text:
+            caption_text_cache.set(video_id, caption_text)
+        return caption_text
+    if caption_id == "":
+        logger.info(f"비디오 {video_id}에 사용 가능한 자막이 없습니다.")
+    return None
 
 
 def download_caption(caption_id):
     """지정된 자막 ID의 자막 내용을 다운로드합니다."""
-    url = f"https://www.googleapis.com/youtube/v3/captions/{caption_id}?key={YOUTUBE_API_KEY}"
+    url = f"https://www.googleapis.com/youtube/v3/captions/{caption_id}?tfmt=srt&key={YOUTUBE_API_KEY}"
 
     try:
         response = requests.get(url, headers={"Accept": "application/json"})
         response.raise_for_status()
+        if "json" not in response.headers.get("Content-Type", ""):
+            # tfmt=srt 요청 시 시간 정보가 포함된 SRT 텍스트가 그대로 반환됨
+            return response.text
         caption_data = response.json()
 
         return caption_data.get("text", "")
@@ -205,7 +258,163 @@ def download_caption(caption_id):
         return None
 
 
-def process_video(video_url, user_id, progress_bar=None):
+TIMESTAMP_PATTERN = re.compile(
+    r'((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})'
+)
+
+
+def _timestamp_to_seconds(timestamp):
+    parts = timestamp.replace(',', '.').split(':')
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_caption_segments(caption_text):
+    """SRT/VTT 형식의 자막을 시작/종료 시간이 있는 구간 리스트로 변환합니다. 시간 정보가 없으면 빈 리스트를 반환합니다."""
+    segments = []
+    current = None
+    for line in caption_text.splitlines():
+        line = line.strip()
+        match = TIMESTAMP_PATTERN.search(line)
+        if match:
+            current = {
+                "start": _timestamp_to_seconds(match.group(1)),
+                "end": _timestamp_to_seconds(match.group(2)),
+                "text": "",
+            }
+            segments.append(current)
+        elif not line:
+            current = None
+        elif current is not None:
+            text = re.sub(r'<[^>]+>', '', line)
+            current["text"] = f"{current['text']} {text}".strip()
+    return [segment for segment in segments if segment["text"]]
+
+
+def transcribe_audio_segments(file_path):
+    """오디오 파일을 텍스트와 시간 정보가 있는 구간 리스트로 변환합니다."""
+    def request():
+        with open(file_path, "rb") as audio_file:
+            return client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file,
+                response_format="verbose_json"
+            )
+
+    transcript = rate_limit.limited_call("openai", "whisper-1", request)
+    segments = [
+        {"start": float(segment.start), "end": float(segment.end), "text": segment.text.strip()}
+        for segment in (transcript.segments or [])
+    ]
+    return transcript.text, segments
+
+
+def prefetch_video(video_url):
+    """
+    URL이 입력되면 중복 확인, 메타데이터 조회, 자막 다운로드를 백그라운드에서 미리 시작합니다.
+    결과는 캐시에 저장되어 이후 process_video가 그대로 사용합니다. 같은 영상에 대해서는 한 번만 실행됩니다.
+    """
+    try:
+        normalized_url, video_id = extract_video_id_and_process(video_url)
+    except ValueError:
+        return None
+
+    future = _prefetches.get(video_id)
+    if future is None:
+        future = _prefetch_executor.submit(_prefetch, normalized_url, video_id)
+        _prefetches.set(video_id, future)
+    return future
+
+
+def _prefetch(normalized_url, video_id):
+    try:
+        with metrics.span("prefetch"):
+            if get_existing_video(video_id):
+                return
+            _, _, duration = get_video_info(normalized_url)
+            if duration <= MAX_VIDEO_DURATION:
+                get_video_captions(video_id)
+    except Exception as e:
+        logger.warning(f"비디오 {video_id} 미리 가져오기 실패: {str(e)}")
+
+
+def wait_for_prefetch(video_id, timeout=PREFETCH_WAIT_SECONDS):
+    """
+    진행 중인 미리 가져오기가 있으면 끝날 때까지 기다려 같은 API 호출이 중복되지 않게 합니다.
+    아직 대기열에서 시작되지 않았다면 다른 사용자의 작업 뒤에서 기다리지 않도록 취소하고 바로 반환합니다.
+    영상마다 한 번만 기다리며, 이후 호출은 즉시 반환합니다.
+    """
+    future = _prefetches.pop(video_id)
+    if future is None or future.done():
+        return
+    if not future.running() and future.cancel():
+        metrics.inc_counter("prefetch_cancelled")
+        return
+    with metrics.span("prefetch_wait"):
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+
+
+class NearDuplicateFound(Exception):
+    """처리하려는 영상과 거의 같은 영상이 이미 처리되어 있을 때 발생합니다."""
+
+    def __init__(self, video_id, candidates):
+        super().__init__(f"비디오 ID {video_id}와 유사한 영상이 이미 처리되어 있습니다.")
+        self.video_id = video_id
+        self.candidates = candidates
+
+
+def find_near_duplicates(video_id, duration, fingerprint):
+    """
+    지문이 비슷한 기존 영상을 유사도 순으로 반환합니다.
+    양쪽 모두 자막 지문이 있으면 내용 유사도(Jaccard와 포함도 중 큰 값)를, 없으면 제목 유사도와 길이 비율을 사용합니다.
+    """
+    candidates = find_fingerprint_candidates(fingerprint["bands"], fingerprint["title_bands"], duration)
+    duplicates = []
+    for candidate in candidates:
+        if candidate["video_id"] == video_id:
+            continue
+        other = candidate.get("fingerprint") or {}
+        if fingerprint["signature"] and other.get("signature"):
+            jaccard = estimate_jaccard(fingerprint["signature"], other["signature"])
+            containment = estimate_containment(jaccard, fingerprint["shingle_count"], other.get("shingle_count", 0))
+            similarity, match, threshold = max(jaccard, containment), "content", NEAR_DUPLICATE_THRESHOLD
+        else:
+            title_similarity = estimate_jaccard(fingerprint["title_signature"], other.get("title_signature"))
+            duration_ratio = min(duration, candidate.get("duration", 0)) / max(duration, candidate.get("duration", 0), 1)
+            similarity, match, threshold = title_similarity * duration_ratio, "title", NEAR_DUPLICATE_TITLE_THRESHOLD
+        if similarity >= threshold:
+            duplicates.append({
+                "video_id": candidate["video_id"],
+                "title": candidate.get("title", "Unknown"),
+                "channel": candidate.get("channel", "Unknown"),
+                "similarity": round(similarity, 2),
+                "match": match,
+            })
+    return sorted(duplicates, key=lambda duplicate: duplicate["similarity"], reverse=True)
+
+
+def link_to_existing_video(video_id, existing_video_id, user_id):
+    """새 영상을 처리하지 않고 유사한 기존 영상의 트랜스크립트를 사용합니다."""
+    add_video_alias(video_id, existing_video_id)
+    update_user_for_video(existing_video_id, user_id)
+    logger.info(f"비디오 ID {video_id}를 기존 비디오 {existing_video_id}에 연결했습니다.")
+
+
+def process_video(video_url, user_id, progress_bar=None, check_near_duplicates=True):
+    """
+    영상을 처리해 저장합니다. check_near_duplicates가 True이면 비싼 처리 전에
+    유사 중복 영상을 찾아 NearDuplicateFound를 발생시킵니다.
+    """
+    with metrics.request("ingest", user_id=user_id):
+        return _process_video(video_url, user_id, progress_bar, check_near_duplicates)
+
+
+def _process_video(video_url, user_id, progress_bar=None, check_near_duplicates=True):
     try:
         # URL인지 비디오 ID인지 확인
         if 'youtube.com' in video_url or 'youtu.be' in video_url:
@@ -217,64 +426,93 @@ def process_video(video_url, user_id, progress_bar=None):
             normalized_url = f"https://www.youtube.com/watch?v={video_id}"
 
         logger.info(f"처리할 비디오 ID: {video_id}")
+        metrics.bind(video_id=video_id)
+        wait_for_prefetch(video_id)
 
         # 기존 처리된 비디오 확인
-        existing_video = get_existing_video(video_id)
+        with metrics.span("duplicate_check"):
+            existing_video = get_existing_video(video_id)
         if existing_video:
             logger.info(f"비디오 ID {video_id}는 이미 처리되었습니다. 기존 데이터를 사용합니다.")
-            update_user_for_video(existing_video['_id'], user_id)
+            update_user_for_video(existing_video['video_id'], user_id)
             return existing_video['_id']
 
         # 새 비디오 처리 로직
-        title, channel, duration = get_video_info(normalized_url)
+        with metrics.span("metadata_fetch"):
+            title, channel, duration = get_video_info(normalized_url)
 
         if duration > MAX_VIDEO_DURATION:
             raise ValueError(f"비디오 길이가 {MAX_VIDEO_DURATION // 60}분을 초과합니다.")
 
         # 자막 데이터 가져오기 시도
-        caption_text = get_video_captions(video_id)
+        with metrics.span("caption_fetch"):
+            caption_text = get_video_captions(video_id)
         if progress_bar:
             if caption_text:
                 progress_bar.progress(20, text="자막 다운로드 성공! 🥳")
             else:
                 progress_bar.progress(20, text="자막 다운로드 실패 😔 오디오 변환 시도 중...")
 
+        if caption_text:
+            segments = parse_caption_segments(caption_text)
+            transcript = " ".join(segment["text"] for segment in segments) if segments else caption_text
+
+        # 오디오 다운로드/변환 전에 유사 중복 확인 (자막이 없으면 제목과 길이로만 판단)
+        fingerprint = compute_fingerprint(title, transcript if caption_text else None)
+        if check_near_duplicates:
+            with metrics.span("near_duplicate_check"):
+                duplicates = find_near_duplicates(video_id, duration, fingerprint)
+            if duplicates:
+                raise NearDuplicateFound(video_id, duplicates)
+
         if caption_text:
             logger.info("자막 데이터를 성공적으로 가져왔습니다.")
-            transcript = caption_text
         else:
             logger.info("자막을 가져올 수 없어 오디오 변환을 시도합니다.")
             if progress_bar:
                 progress_bar.progress(30, text="영상 다운로드 중... 🌎")
-            audio_file = download_and_process_audio(normalized_url, video_id)
+            with metrics.span("audio_download"):
+                audio_file = download_and_process_audio(normalized_url, video_id)
             if progress_bar:
                 progress_bar.progress(45, text="영상을 텍스트로 변환 중... 💬")
-            transcript = transcribe_audio(audio_file)
+            with metrics.span("transcription"):
+                transcript, segments = transcribe_audio_segments(audio_file)
             os.remove(audio_file)
+            fingerprint = compute_fingerprint(title, transcript)
 
         if progress_bar:
             progress_bar.progress(90, text="텍스트 임베딩 중... 🤖")
         embedding = embed_text(transcript)
 
+        if progress_bar:
+            progress_bar.progress(95, text="영상 요약 중... 📝")
+        with metrics.span("summarization"):
+            summary, key_points = summarize_transcript(transcript, title)
+
         video_data = {
             "video_id": video_id,
-            "user_ids": [user_id],
             "title": title,
             "channel": channel,
             "duration": duration,
             "transcript": transcript,
+            "segments": segments,  # 시작/종료 시간(초)이 있는 구간 리스트
+            "segment_count": len(segments),
             "embedding": embedding,
+            "summary": summary,  # 다수 영상 질문 시 영상 선별에 사용
+            "key_points": key_points,
+            "fingerprint": fingerprint,  # 유사 중복 탐지용 MinHash 서명과 LSH 밴드
             "source": "caption" if caption_text else "audio_transcription",
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
             "processed_at": datetime.utcnow(),
-            "transcript_length": len(transcript),
-            "tags": []  # 새로운 필드: 태그 (빈 리스트로 초기화)
+            "transcript_length": len(transcript)
         }
 
         if progress_bar:
             progress_bar.progress(100, text="DB 저장 완료! ✅")  # 진행률 100%로 설정
-        result = videos_collection.insert_one(video_data)
+        with metrics.span("db_insert"):
+            result = videos_collection.insert_one(video_data)
+            update_user_for_video(video_id, user_id)
         return result.inserted_id
 
     except Exception as e:
@@ -305,15 +543,35 @@ def download_and_process_audio(url, video_id):
 
 
 def update_user_for_video(video_id, user_id):
-    videos_collection.update_one(
-        {"_id": video_id},
-        {"$addToSet": {"user_ids": user_id}}
-    )
+    """사용자 목록에 비디오를 추가합니다. (사용자별 태그는 video_memberships에 저장)"""
+    add_video_for_user(user_id, video_id)
+
+
+def recompute_fingerprints(batch_size=200):
+    """저장된 모든 비디오의 유사 중복 탐지 지문을 현재 방식으로 다시 계산합니다. 여러 번 실행해도 안전합니다."""
+    cursor = videos_collection.find({}, {"title": 1, "transcript": 1}).batch_size(batch_size)
+    operations = []
+    updated = 0
+    for video in cursor:
+        fingerprint = compute_fingerprint(video.get("title", ""), video.get("transcript"))
+        operations.append(UpdateOne({"_id": video["_id"]}, {"$set": {"fingerprint": fingerprint}}))
+        if len(operations) >= batch_size:
+            updated += videos_collection.bulk_write(operations, ordered=False).modified_count
+            operations.clear()
+    if operations:
+        updated += videos_collection.bulk_write(operations, ordered=False).modified_count
+    logger.info(f"비디오 {updated}개의 지문을 다시 계산했습니다.")
+    return updated
 
 
 def get_existing_video(video_id):
-    """데이터베이스에서 기존 처리된 비디오를 찾습니다."""
-    return videos_collection.find_one({"video_id": video_id})
+    """데이터베이스에서 기존 처리된 비디오를 찾습니다. 유사 중복으로 연결된 비디오 ID도 따라갑니다."""
+    video = videos_collection.find_one({"video_id": video_id})
+    if video is None:
+        canonical_video_id = get_video_alias(video_id)
+        if canonical_video_id:
+            video = videos_collection.find_one({"video_id": canonical_video_id})
+    return video
 
 
 def format_time(seconds):
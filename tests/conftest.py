@@ -0,0 +1,8 @@
+import os
+import sys
+
+# API 클라이언트 생성 시 키 검사를 통과하도록 임의 값 설정 (테스트는 외부 API를 호출하지 않음)
+for _key in ("OPENAI_API_KEY", "GEMINI_API_KEY", "YOUTUBE_API_KEY"):
+    os.environ.setdefault(_key, "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
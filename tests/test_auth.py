@@ -0,0 +1,40 @@
+import pytest
+from bson import ObjectId
+
+from modules import auth
+
+
+@pytest.fixture
+def user(monkeypatch):
+    user = {"_id": ObjectId(), "username": "tester", "token_version": 0}
+    monkeypatch.setattr(auth, "SECRET_KEY", "test-secret")
+    monkeypatch.setattr(auth, "get_user_by_id", lambda user_id: dict(user) if user_id == user["_id"] else None)
+    return user
+
+
+def test_valid_token_restores_user(user):
+    token = auth.create_session_token(user)
+    assert auth.restore_session(token)["_id"] == user["_id"]
+
+
+def test_tampered_token_is_rejected(user):
+    token = auth.create_session_token(user)
+    user_id, version, expires_at, signature = token.split('.')
+    assert auth.restore_session(f"{user_id}.{version}.{int(expires_at) + 3600}.{signature}") is None
+
+
+def test_expired_token_is_rejected(user, monkeypatch):
+    monkeypatch.setattr(auth, "SESSION_TOKEN_TTL_SECONDS", -1)
+    assert auth.restore_session(auth.create_session_token(user)) is None
+
+
+def test_revoked_token_is_rejected(user):
+    token = auth.create_session_token(user)
+    user["token_version"] = 1
+    assert auth.restore_session(token) is None
+
+
+def test_tokens_disabled_without_secret_key(user, monkeypatch):
+    monkeypatch.setattr(auth, "SECRET_KEY", None)
+    assert auth.create_session_token(user) is None
+    assert auth.restore_session("anything") is None
@@ -0,0 +1,42 @@
+from modules.cache import TTLCache
+
+
+def test_get_and_set():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("missing", "default") == "default"
+    assert "a" in cache
+    assert len(cache) == 1
+
+
+def test_expired_entries_are_dropped():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is None
+    assert "a" not in cache
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_falsy_values_are_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("empty", "")
+    assert cache.get_many(["empty", "missing"]) == {"empty": ""}
+
+
+def test_pop():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+    assert cache.pop("a") == 1
+    assert cache.pop("a", "gone") == "gone"
@@ -0,0 +1,62 @@
+from modules.nlp import video_passages
+from modules.video_processing import parse_caption_segments
+
+
+def test_srt_with_cue_numbers():
+    srt = (
+        "1\n"
+        "00:00:01,000 --> 00:00:03,500\n"
+        "안녕하세요\n"
+        "\n"
+        "2\n"
+        "00:00:04,000 --> 00:00:06,000\n"
+        "오늘은 파이썬을\n"
+        "배워봅시다\n"
+    )
+    assert parse_caption_segments(srt) == [
+        {"start": 1.0, "end": 3.5, "text": "안녕하세요"},
+        {"start": 4.0, "end": 6.0, "text": "오늘은 파이썬을 배워봅시다"},
+    ]
+
+
+def test_vtt_header_and_inline_tags_are_dropped():
+    vtt = (
+        "WEBVTT\n"
+        "Kind: captions\n"
+        "Language: ko\n"
+        "\n"
+        "00:01.000 --> 00:02.500 align:start position:0%\n"
+        "<c>첫</c><00:00:01.500><c> 문장</c>\n"
+        "\n"
+        "01:00:00.000 --> 01:00:01.000\n"
+        "마지막\n"
+    )
+    assert parse_caption_segments(vtt) == [
+        {"start": 1.0, "end": 2.5, "text": "첫 문장"},
+        {"start": 3600.0, "end": 3601.0, "text": "마지막"},
+    ]
+
+
+def test_untimed_text_has_no_segments():
+    assert parse_caption_segments("시간 정보가 없는 자막\n두 번째 줄") == []
+
+
+def test_passages_group_segments_by_window():
+    video = {
+        "video_id": "abc",
+        "title": "강의",
+        "segments": [
+            {"start": 0.0, "end": 30.0, "text": "하나"},
+            {"start": 30.0, "end": 61.0, "text": "둘"},
+            {"start": 61.0, "end": 90.0, "text": "셋"},
+        ],
+    }
+    assert video_passages(video) == [
+        "[강의 00:00](https://www.youtube.com/watch?v=abc&t=0s) 하나 둘",
+        "[강의 01:01](https://www.youtube.com/watch?v=abc&t=61s) 셋",
+    ]
+
+
+def test_passages_fall_back_to_transcript_without_segments():
+    assert video_passages({"video_id": "abc", "transcript": "전체 내용", "segments": []}) == ["전체 내용"]
+    assert video_passages({"video_id": "abc"}) == []
@@ -0,0 +1,58 @@
+import random
+
+from modules import fingerprint
+from modules.fingerprint import (compute_fingerprint, content_shingles, estimate_containment, estimate_jaccard,
+                                 lsh_bands, minhash_signature)
+
+
+def make_text(seed, words=600):
+    rng = random.Random(seed)
+    syllables = "가나다라마바사아자차카타파하거너더러머버서어저처"
+    return " ".join("".join(rng.choice(syllables) for _ in range(rng.randint(2, 5))) for _ in range(words))
+
+
+def test_normalization_ignores_case_spacing_and_punctuation():
+    assert content_shingles("Hello, World!") == content_shingles("hello world")
+
+
+def test_identical_text_has_identical_signature():
+    text = make_text(1)
+    assert estimate_jaccard(minhash_signature(content_shingles(text)),
+                            minhash_signature(content_shingles(text))) == 1.0
+
+
+def test_unrelated_texts_have_low_similarity():
+    a = minhash_signature(content_shingles(make_text(1)))
+    b = minhash_signature(content_shingles(make_text(2)))
+    assert estimate_jaccard(a, b) < 0.2
+
+
+def test_clip_is_detected_by_containment():
+    full = make_text(3)
+    clip = full[:len(full) // 4]
+    full_shingles, clip_shingles = content_shingles(full), content_shingles(clip)
+    jaccard = estimate_jaccard(minhash_signature(full_shingles), minhash_signature(clip_shingles))
+    assert jaccard < 0.5
+    assert estimate_containment(jaccard, len(full_shingles), len(clip_shingles)) > 0.7
+
+
+def test_containment_of_empty_set_is_zero():
+    assert estimate_containment(0.5, 0, 10) == 0.0
+
+
+def test_lsh_bands_split_signature():
+    signature = minhash_signature(content_shingles(make_text(4)))
+    bands = lsh_bands(signature, fingerprint.NUM_BANDS)
+    assert len(signature) == fingerprint.NUM_PERM
+    assert len(bands) == fingerprint.NUM_BANDS
+    assert len(set(bands)) == len(bands)
+    assert lsh_bands([], fingerprint.NUM_BANDS) == []
+
+
+def test_fingerprint_without_transcript_has_only_title():
+    result = compute_fingerprint("Python 강의 1화")
+    assert result["signature"] == []
+    assert result["bands"] == []
+    assert result["shingle_count"] == 0
+    assert len(result["title_signature"]) == fingerprint.TITLE_NUM_PERM
+    assert len(result["title_bands"]) == fingerprint.TITLE_NUM_BANDS
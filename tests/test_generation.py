@@ -0,0 +1,74 @@
+import threading
+
+import pytest
+
+from modules import nlp
+
+
+@pytest.fixture
+def generators(monkeypatch):
+    """공급자별 가짜 생성 함수를 등록합니다."""
+    def install(**fns):
+        for provider, fn in fns.items():
+            monkeypatch.setitem(nlp.GENERATORS, provider, fn)
+        return list(fns)
+    return install
+
+
+def test_primary_answer_is_used(generators):
+    providers = generators(primary=lambda prompt: "primary", secondary=lambda prompt: "secondary")
+    assert nlp.generate_text("질문", providers=providers, hedge_delay=5) == "primary"
+
+
+def test_error_fails_over_to_next_provider(generators):
+    def failing(prompt):
+        raise RuntimeError("down")
+
+    providers = generators(primary=failing, secondary=lambda prompt: "secondary")
+    assert nlp.generate_text("질문", providers=providers, hedge_delay=5) == "secondary"
+
+
+def test_slow_primary_is_hedged(generators):
+    release = threading.Event()
+
+    def slow(prompt):
+        release.wait(5)
+        return "primary"
+
+    providers = generators(primary=slow, secondary=lambda prompt: "secondary")
+    try:
+        assert nlp.generate_text("질문", providers=providers, hedge_delay=0.05) == "secondary"
+    finally:
+        release.set()
+
+
+def test_all_failures_raise_primary_error(generators):
+    class PrimaryError(Exception):
+        pass
+
+    def primary(prompt):
+        raise PrimaryError()
+
+    def secondary(prompt):
+        raise RuntimeError("also down")
+
+    providers = generators(primary=primary, secondary=secondary)
+    with pytest.raises(PrimaryError):
+        nlp.generate_text("질문", providers=providers, hedge_delay=5)
+
+
+def test_failover_runs_on_hedge_pool_only_for_interactive_requests(generators):
+    threads = []
+
+    def failing(prompt):
+        raise RuntimeError("down")
+
+    def secondary(prompt):
+        threads.append(threading.current_thread().name)
+        return "secondary"
+
+    providers = generators(primary=failing, secondary=secondary)
+    nlp.generate_text("질문", providers=providers, hedge_delay=5)
+    nlp.generate_text("질문", providers=providers, hedge_delay=-1, interactive=False)
+    assert threads[0].startswith("llm-hedge")
+    assert not threads[1].startswith("llm-hedge")
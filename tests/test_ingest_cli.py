@@ -0,0 +1,28 @@
+import ingest_cli
+from ingest_cli import Checkpoint
+
+
+def test_rerun_skips_finished_videos_and_retries_the_rest(tmp_path):
+    path = tmp_path / "videos.txt.progress.jsonl"
+    checkpoint = Checkpoint(str(path))
+    for video_id, status in [("done", "done"), ("linked", "linked"), ("skipped", "skipped"),
+                             ("failed", "failed"), ("review", "needs_review"), ("retried", "failed")]:
+        checkpoint.record(video_id, status)
+    checkpoint.record("retried", "done")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"video_id": "partial", "sta')  # 기록 도중 중단된 마지막 줄
+
+    resumed = Checkpoint(str(path))
+    video_ids = ["done", "linked", "skipped", "failed", "review", "retried", "partial", "new"]
+    assert [video_id for video_id in video_ids if not resumed.is_finished(video_id)] == [
+        "failed", "review", "partial", "new"
+    ]
+
+
+def test_near_duplicate_check_follows_link_option(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest_cli.video_processing, "process_video",
+                        lambda video_id, user_id, **kwargs: calls.append(kwargs))
+    assert ingest_cli.ingest_one("abc", "user", link_near_duplicates=False) == ("done", {})
+    assert ingest_cli.ingest_one("abc", "user", link_near_duplicates=True) == ("done", {})
+    assert calls == [{"check_near_duplicates": False}, {"check_near_duplicates": True}]
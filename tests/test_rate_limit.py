@@ -0,0 +1,108 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from modules import rate_limit
+from modules.rate_limit import AdaptiveConcurrency, ProviderLimiter, TokenBucket
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(sleep=lambda seconds: None, monotonic=time.monotonic))
+
+
+def test_token_bucket_caps_request_at_capacity():
+    bucket = TokenBucket(60)
+    bucket.acquire(1000)
+    assert bucket.tokens < 1
+
+
+def test_concurrency_grows_only_on_success():
+    concurrency = AdaptiveConcurrency(8)
+    concurrency.limit = 4.0
+
+    concurrency.acquire()
+    concurrency.release(succeeded=False)
+    assert concurrency.limit == 4.0
+
+    concurrency.acquire()
+    concurrency.release(succeeded=True)
+    assert concurrency.limit == 4.25
+
+    concurrency.acquire()
+    concurrency.release(succeeded=False, throttled=True)
+    assert concurrency.limit == 2.125
+
+
+def test_concurrency_limit_never_drops_below_one():
+    concurrency = AdaptiveConcurrency(2)
+    for _ in range(5):
+        concurrency.acquire()
+        concurrency.release(succeeded=False, throttled=True)
+    assert concurrency.limit == 1.0
+
+
+def test_call_retries_rate_limit_errors_then_succeeds():
+    limiter = ProviderLimiter("test:retry", max_concurrency=4)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError()
+        return "ok"
+
+    assert limiter.call(fn, max_retries=5) == "ok"
+    assert len(attempts) == 3
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_last_rate_limit_error_shrinks_limit():
+    limiter = ProviderLimiter("test:exhausted", max_concurrency=8)
+
+    def fn():
+        raise RateLimitError()
+
+    with pytest.raises(RateLimitError):
+        limiter.call(fn, max_retries=0)
+    assert limiter.concurrency.limit == 4.0
+
+
+def test_other_errors_are_not_retried_and_keep_limit():
+    limiter = ProviderLimiter("test:timeout", max_concurrency=8)
+    limiter.concurrency.limit = 4.0
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise TimeoutError()
+
+    with pytest.raises(TimeoutError):
+        limiter.call(fn)
+    assert len(attempts) == 1
+    assert limiter.concurrency.limit == 4.0
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_bucket_wait_happens_before_taking_a_slot():
+    limiter = ProviderLimiter("test:bucket", rpm=60, max_concurrency=1)
+    observed = []
+
+    class RecordingBucket:
+        def acquire(self, amount=1):
+            observed.append((limiter.bucket_waiting, limiter.concurrency.in_flight))
+
+    limiter.requests = RecordingBucket()
+    limiter.call(lambda: None)
+    assert observed == [(1, 0)]
+    assert limiter.bucket_waiting == 0
+
+
+def test_is_rate_limit_error():
+    assert rate_limit.is_rate_limit_error(RateLimitError())
+    assert not rate_limit.is_rate_limit_error(ValueError())